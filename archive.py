@@ -0,0 +1,146 @@
+'''writes the exported site to an archive, compressing on every core'''
+
+import os
+import zlib
+import tarfile
+import zipfile
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from exceptions import InvalidInputError
+
+FORMATS = ('zip', 'tar.zst')
+# already compressed files which deflate cannot shrink
+STORED_SUFFIXES = frozenset([
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.ico',
+    '.mp4', '.webm', '.mov', '.mp3', '.ogg', '.m4a',
+    '.woff', '.woff2', '.zip', '.gz', '.br', '.zst',
+])
+SMALL_FILE = 64 * 1024      # compressed in process, not worth sending to a worker
+LARGE_FILE = 64 * 1024 ** 2     # streamed to the zip in process, its deflated data would not fit in memory
+WINDOW_SIZE = 256 * 1024 ** 2   # bytes of files compressed ahead of the one being written
+BLOCK_SIZE = 1024 ** 2
+# the ``ZipFile`` internals ``write_deflated`` relies on
+ZIPFILE_INTERNALS = ('_writecheck', '_didModify', 'start_dir', 'fp', 'filelist', 'NameToInfo')
+
+
+def walk(root_dir: str) -> List[Tuple[str, str]]:
+    '''returns the (path, archive name) of every file under ``root_dir``'''
+    entries = []
+    for root, dirs, files in os.walk(root_dir):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            entries.append((path, os.path.relpath(path, root_dir)))
+    return entries
+
+
+def deflate(path: str, level: int) -> Tuple[int, int, bytes]:
+    '''compresses a file as a raw deflate stream, returning its crc, size and data'''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc, size, chunks = 0, 0, []
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            chunks.append(compressor.compress(block))
+    chunks.append(compressor.flush())
+    return crc, size, b''.join(chunks)
+
+
+def writes_deflated(zf: zipfile.ZipFile) -> bool:
+    '''checks that ``write_deflated`` works with this version of ``zipfile``'''
+    return all(hasattr(zf, name) for name in ZIPFILE_INTERNALS)
+
+
+def write_deflated(zf: zipfile.ZipFile, path: str, arcname: str, crc: int, size: int, data: bytes):
+    '''adds an entry compressed by ``deflate`` to an open zip file
+
+    mirrors ``ZipFile._open_to_write``, which has no public way of taking
+    data that was compressed elsewhere, see ``writes_deflated``
+    '''
+    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size = size
+    zinfo.compress_size = len(data)
+    zinfo.CRC = crc
+
+    zf.fp.seek(zf.start_dir)
+    zinfo.header_offset = zf.fp.tell()
+    zf._writecheck(zinfo)
+    zf._didModify = True
+    zf.fp.write(zinfo.FileHeader())
+    zf.fp.write(data)
+    zf.start_dir = zf.fp.tell()
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+
+
+def make_zip(filename: str, root_dir: str, *, jobs: int = None, store_media: bool = False, level: int = 6) -> str:
+    '''zips ``root_dir``, deflating the large entries in a process pool
+
+    entries are written in order as their compression finishes, with at most
+    a few entries per worker and ``WINDOW_SIZE`` bytes held in memory. Files
+    over ``LARGE_FILE`` are streamed to the zip in process. With ``store_media``
+    already compressed files (images, videos, fonts) are stored as is.
+    If this version of ``zipfile`` lacks the internals ``write_deflated``
+    uses, every entry is compressed in process
+    '''
+    jobs = jobs or os.cpu_count() or 1
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as zf, \
+            ProcessPoolExecutor(max_workers=jobs) as pool:
+        parallel = writes_deflated(zf)
+        window = deque()
+        window_size = 0
+
+        def write_next():
+            nonlocal window_size
+            path, arcname, size, future = window.popleft()
+            if future is None:
+                compress_type = zipfile.ZIP_STORED if store_media and Path(path).suffix.lower() in STORED_SUFFIXES else None
+                zf.write(path, arcname, compress_type=compress_type)
+            else:
+                window_size -= size
+                write_deflated(zf, path, arcname, *future.result())
+
+        for path, arcname in walk(root_dir):
+            stored = store_media and Path(path).suffix.lower() in STORED_SUFFIXES
+            size = os.path.getsize(path)
+            if not parallel or stored or size <= SMALL_FILE or size > LARGE_FILE:
+                future = None
+            else:
+                future = pool.submit(deflate, path, level)
+                window_size += size
+            window.append((path, arcname, size, future))
+            while len(window) > jobs * 4 or window_size > WINDOW_SIZE:
+                write_next()
+        while window:
+            write_next()
+    return filename
+
+
+def make_tar_zst(filename: str, root_dir: str, *, jobs: int = None, level: int = 3) -> str:
+    '''writes ``root_dir`` to a zstandard compressed tar using ``jobs`` threads'''
+    try:
+        import zstandard
+    except ImportError:
+        raise InvalidInputError('the tar.zst format requires the zstandard package')
+
+    compressor = zstandard.ZstdCompressor(level=level, threads=jobs or -1)
+    with open(filename, 'wb') as f, compressor.stream_writer(f) as writer, \
+            tarfile.open(fileobj=writer, mode='w|') as tar:
+        for path, arcname in walk(root_dir):
+            tar.add(path, arcname)
+    return filename
+
+
+def make_archive(base_name: str, root_dir: str, format: str = 'zip', *, jobs: int = None, store_media: bool = False) -> str:
+    '''archives ``root_dir`` to ``<base_name>.<format>``, returning the filename'''
+    filename = f'{base_name}.{format}'
+    if format == 'zip':
+        return make_zip(filename, root_dir, jobs=jobs, store_media=store_media)
+    elif format == 'tar.zst':
+        return make_tar_zst(filename, root_dir, jobs=jobs)
+    raise InvalidInputError(f'archive format must be one of {", ".join(FORMATS)}')
@@ -0,0 +1,139 @@
+'''canonical urls and near duplicate page detection'''
+
+import os
+import re
+import hashlib
+from fnmatch import fnmatch
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# query parameters which never change the content of a page
+TRACKING_PARAMS = (
+    'utm_*', 'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid',
+    'sid', 'sessionid', 'session_id', 'phpsessid', 'jsessionid',
+)
+
+word_pattern = re.compile(r'\w+', re.UNICODE)
+
+
+class URLCanonicalizer:
+    '''Reduces the urls of the same page to a single canonical form
+
+    ...
+
+    Attributes
+    ----------
+    strip_params (list)
+        query parameter names (glob patterns, case insensitive) which are dropped
+    sort_query (bool)
+        sorts the query parameters
+    strip_fragment (bool)
+        drops the ``#fragment``
+    strip_trailing_slash (bool)
+        treats ``/about/`` as ``/about``
+    '''
+
+    def __init__(
+            self,
+            *,
+            strip_params: Iterable[str] = TRACKING_PARAMS,
+            sort_query: bool = True,
+            strip_fragment: bool = True,
+            strip_trailing_slash: bool = False
+        ) -> None:
+        self.strip_params = [param.lower() for param in strip_params]
+        self.sort_query = sort_query
+        self.strip_fragment = strip_fragment
+        self.strip_trailing_slash = strip_trailing_slash
+        self._cache: Dict[str, str] = {}
+
+    def stripped(self, name: str) -> bool:
+        name = name.lower()
+        return any(fnmatch(name, pattern) for pattern in self.strip_params)
+
+    def __call__(self, url: str) -> str:
+        canonical = self._cache.get(url)
+        if canonical is None:
+            canonical = self._cache[url] = self.canonicalize(url)
+        return canonical
+
+    def canonicalize(self, url: str) -> str:
+        parts = urlsplit(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not self.stripped(k)]
+        if self.sort_query:
+            query.sort()
+        path = parts.path
+        if self.strip_trailing_slash and len(path) > 1:
+            path = path.rstrip('/')
+        return urlunsplit((
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            path,
+            urlencode(query),
+            '' if self.strip_fragment else parts.fragment
+        ))
+
+
+def redirect_page(path: str, target: str) -> bytes:
+    '''returns a page sending the browser from ``path`` to ``target``'''
+    url = os.path.relpath(target, os.path.dirname(path) or '.')
+    return f'<!DOCTYPE html><meta http-equiv="refresh" content="0; url={url}">'.encode('utf8')
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    words = word_pattern.findall(text.lower())
+    if len(words) < size:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    '''returns the SimHash fingerprint of a text over its word 3-grams
+
+    texts sharing most of their 3-grams get fingerprints which differ
+    in only a few bits
+    '''
+    weights = [0] * bits
+    for shingle in shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf8'), digest_size=bits // 8).digest(), 'big')
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class SimHashIndex:
+    '''Finds the fingerprints within ``distance`` bits of a new one
+
+    the 64 bit fingerprints are split into ``distance + 1`` bands, two
+    fingerprints within ``distance`` bits share at least one band exactly,
+    so only the fingerprints sharing a band are compared. Each fingerprint
+    is stored with an item, e.g the link of its page
+    '''
+
+    def __init__(self, distance: int = 3, bits: int = 64) -> None:
+        self.distance = distance
+        self.bits = bits
+        self.bands = distance + 1
+        self.band_bits = bits // self.bands
+        self.tables: List[Dict[int, List]] = [{} for _ in range(self.bands)]
+
+    def keys(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands):
+            yield band, fingerprint >> (band * self.band_bits) & mask
+
+    def find(self, fingerprint: int) -> Optional[Any]:
+        '''returns the item of a near duplicate of ``fingerprint`` if any'''
+        for band, key in self.keys(fingerprint):
+            for other, item in self.tables[band].get(key, ()):
+                if hamming(fingerprint, other) <= self.distance:
+                    return item
+        return None
+
+    def add(self, fingerprint: int, item: Any):
+        for band, key in self.keys(fingerprint):
+            self.tables[band].setdefault(key, []).append((fingerprint, item))
@@ -14,9 +14,26 @@ class PageURLRequiredError(Exception):
 
 class PageNotFoundError(Exception):
     message = 'URL is not a valid endpoint. It returns 404 on request'
+    status = 404
 
 class FileAlreadyExists(Exception):
     message = 'The file path you are trying to download already exists'
 
 class AuthenticationError(Exception):
-    message = 'You are not authorized to access this page'
\ No newline at end of file
+    message = 'You are not authorized to access this page'
+    status = 403
+
+class RangeNotSatisfiedError(Exception):
+    message = 'The server did not return the requested byte range'
+
+class ContentTooLargeError(Exception):
+    message = 'The response body is larger than the allowed size'
+
+
+class NotHTMLError(Exception):
+    message = 'The page link points to a file which is not html'
+
+    def __init__(self, *args, content_type: str = None, response=None):
+        super().__init__(*args)
+        self.content_type = content_type
+        self.response = response
@@ -0,0 +1,126 @@
+'''remembers the urls which failed during a crawl'''
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Union
+
+from exceptions import PageNotFoundError, AuthenticationError, ContentTooLargeError
+
+# number of retries allowed per error class, looked up along the error's mro
+RETRY_POLICY = {
+    PageNotFoundError: 0,
+    AuthenticationError: 0,
+    ContentTooLargeError: 0,
+    Exception: 2,
+}
+
+
+class Failure:
+    '''A failed url'''
+
+    __slots__ = ('status', 'error', 'attempts', 'retries', 'expires')
+
+    def __init__(self, *, status: int, error: str, attempts: int, retries: int, expires: float) -> None:
+        self.status = status
+        self.error = error
+        self.attempts = attempts
+        self.retries = retries
+        self.expires = expires
+
+    def __repr__(self) -> str:
+        return f'<Failure: {self.error} x{self.attempts}>'
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class FailureCache:
+    '''A negative cache of failed urls
+
+    ...
+
+    A url is fetched again only while it has retries left for the class
+    of its last error; the record is dropped once ``ttl`` seconds have
+    passed since the last failure, or as soon as the url succeeds.
+
+    Attributes
+    ----------
+    ttl (int)
+        seconds a failure is remembered for
+    policy (dict)
+        number of retries allowed per exception class (or class name)
+    path (str)
+        json file the cache is loaded from and saved to, if any
+    '''
+
+    def __init__(
+            self,
+            *,
+            ttl: int = 24 * 3600,
+            policy: Mapping[Union[type, str], int] = None,
+            path: str = None
+        ) -> None:
+        self.ttl = ttl
+        self.policy = {
+            (key if isinstance(key, str) else key.__name__): retries
+            for key, retries in (policy or RETRY_POLICY).items()
+        }
+        self.path = path
+        self.records: Dict[str, Failure] = {}
+        if path and Path(path).exists():
+            self.load()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, url: str):
+        return self.get(url) is not None
+
+    def retries_for(self, error: Exception) -> int:
+        for cls in type(error).__mro__:
+            if cls.__name__ in self.policy:
+                return self.policy[cls.__name__]
+        return 0
+
+    def get(self, url: str) -> Failure:
+        record = self.records.get(url)
+        if record is not None and record.expires < time.time():
+            del self.records[url]
+            return None
+        return record
+
+    def should_fetch(self, url: str) -> bool:
+        '''returns False if the url failed and has no retries left'''
+        record = self.get(url)
+        return record is None or record.attempts <= record.retries
+
+    def record(self, url: str, error: Exception) -> Failure:
+        '''records a failed attempt at fetching ``url``'''
+        previous = self.get(url)
+        record = Failure(
+            status=getattr(error, 'status', None) or getattr(getattr(error, 'response', None), 'status_code', None),
+            error=type(error).__name__,
+            attempts=previous.attempts + 1 if previous else 1,
+            retries=self.retries_for(error),
+            expires=time.time() + self.ttl
+        )
+        self.records[url] = record
+        return record
+
+    def forget(self, url: str):
+        self.records.pop(url, None)
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        now = time.time()
+        self.records = {
+            url: Failure(**record) for url, record in data.items() if record['expires'] >= now
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w') as f:
+            json.dump({url: record.to_dict() for url, record in self.records.items()}, f)
@@ -0,0 +1,451 @@
+'''a crawl frontier shared by the worker processes of one host'''
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import multiprocessing
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List
+
+from models import Link, PathIndex
+from sites import Site, Page, MAX_PAGES, STATS
+from exceptions import FileAlreadyExists, NotHTMLError
+from utils import validate_url
+
+logger = logging.getLogger(__name__)
+
+PAGE = 'page'
+ASSET = 'asset'
+MEDIA = 'media'
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+LEASE_TTL = 300         # seconds before the url of a silent worker is leased again
+BATCH = 4
+IDLE = 1.0
+WORKERS = 4
+
+
+class Lease:
+    '''A url handed to one worker until it completes, fails or ``ttl`` passes'''
+
+    __slots__ = ('url', 'page_url', 'depth', 'kind', 'token')
+
+    def __init__(self, url: str, page_url: str, depth: int, kind: str, token: str) -> None:
+        self.url = url
+        self.page_url = page_url
+        self.depth = depth
+        self.kind = kind
+        self.token = token
+
+    def __repr__(self) -> str:
+        return f'<Lease: {self.kind} {self.url}>'
+
+    def link(self, base_url: str) -> Link:
+        return Link(self.url, page_url=self.page_url, base_url=base_url, depth=self.depth)
+
+
+class Frontier(ABC):
+    '''The store of a distributed crawl
+
+    ...
+
+    Holds every url of the crawl with its state: ``PENDING``, ``LEASED``
+    to a worker, ``DONE`` or ``FAILED``. A url is only added once, so the
+    frontier is also the seen set, and only the holder of the current
+    lease of a url can complete it, so every url is accounted exactly once
+    however many workers fetched it. It also hands out the path every url
+    is saved to, see ``FrontierPathIndex``. Subclasses implement the
+    storage and every method below, workers on several hosts need one
+    reachable over the network.
+    '''
+
+    @abstractmethod
+    def add(self, links: Iterable[Link], kind: str) -> int:
+        '''adds the links which were never seen, returning how many were added'''
+
+    @abstractmethod
+    def lease(self, worker: str, count: int = BATCH, ttl: float = LEASE_TTL) -> List[Lease]:
+        '''hands up to ``count`` pending (or expired) urls to ``worker``'''
+
+    @abstractmethod
+    def complete(self, lease: Lease, *, links: Iterable[Link] = (), assets: Iterable[Link] = (), media: Iterable[Link] = ()) -> bool:
+        '''marks a leased url done and adds what was found on it
+
+        returns False, adding nothing, if the lease expired and the url
+        was handed to another worker
+        '''
+
+    @abstractmethod
+    def fail(self, lease: Lease, error: str, retries: int) -> bool:
+        '''records a failed attempt, the url is leased again while it has ``retries`` left'''
+
+    @abstractmethod
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        '''returns the number of urls per kind and state'''
+
+    @abstractmethod
+    def finished(self) -> bool:
+        '''checks if no url is pending or leased'''
+
+    @abstractmethod
+    def assign_paths(self, links: Iterable[Link]) -> Dict[str, str]:
+        '''returns the path of every link by key, giving the new ones a path no other url has'''
+
+    @abstractmethod
+    def alias_path(self, link: Link, path: str) -> str:
+        '''saves ``link`` to the path of another url, returning the path it had, if any'''
+
+    @abstractmethod
+    def paths(self) -> Dict[str, str]:
+        '''returns the path of every url by key'''
+
+
+class SQLiteFrontier(Frontier):
+    '''A frontier in a SQLite database, for the workers of one host
+
+    ...
+
+    Every process opens its own connection and each operation is a single
+    write transaction, so workers can be started and killed at any time.
+    A crawl is resumed by opening the same database again.
+
+    The database is in WAL mode, which needs memory shared by every
+    process using it: it must be on a local disk and only used by
+    processes of the same host, never over a network filesystem.
+
+    Attributes
+    ----------
+    path (str)
+        the database file
+    max_pages (int)
+        pages added past this number are ignored
+    canonicalize (callable)
+        the key urls are deduplicated on, see ``dedupe.URLCanonicalizer``
+    '''
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS urls (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            page_url TEXT NOT NULL,
+            depth INTEGER NOT NULL DEFAULT 0,
+            kind TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            token TEXT,
+            worker TEXT,
+            expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS urls_state ON urls (state);
+        CREATE TABLE IF NOT EXISTS paths (
+            key TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            alias INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS paths_owner ON paths (path) WHERE alias = 0;
+    '''
+
+    def __init__(self, path: str, *, max_pages: int = MAX_PAGES, canonicalize: Callable[[str], str] = None) -> None:
+        self.path = os.path.abspath(path)
+        self.max_pages = max_pages
+        self.canonicalize = canonicalize
+        self._db = None
+        self._pid = None
+        self.db.executescript(self.SCHEMA)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_db'] = state['_pid'] = None        # connections are not shared across processes
+        return state
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._pid = os.getpid()
+        return self._db
+
+    @contextmanager
+    def transaction(self):
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def remove(path: str):
+        '''deletes a frontier database with its journal files'''
+        for filename in (path, f'{path}-wal', f'{path}-shm'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def key(self, url: str) -> str:
+        return self.canonicalize(url) if self.canonicalize is not None else url
+
+    def _add(self, db: sqlite3.Connection, links: Iterable[Link], kind: str) -> int:
+        room = None
+        if kind == PAGE:
+            room = self.max_pages - db.execute('SELECT count(*) FROM urls WHERE kind = ?', (PAGE,)).fetchone()[0]
+        added = 0
+        for link in links:
+            if room is not None and added >= room:
+                break
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO urls (key, url, page_url, depth, kind) VALUES (?, ?, ?, ?, ?)',
+                (self.key(str(link)), str(link), link.page_url, getattr(link, 'depth', 0), kind)
+            )
+            added += cursor.rowcount
+        return added
+
+    def add(self, links: Iterable[Link], kind: str) -> int:
+        with self.transaction() as db:
+            return self._add(db, links, kind)
+
+    def lease(self, worker: str, count: int = BATCH, ttl: float = LEASE_TTL) -> List[Lease]:
+        now = time.time()
+        with self.transaction() as db:
+            rows = db.execute(
+                'SELECT key, url, page_url, depth, kind FROM urls '
+                'WHERE state = ? OR (state = ? AND expires < ?) ORDER BY rowid LIMIT ?',
+                (PENDING, LEASED, now, count)
+            ).fetchall()
+            leases = []
+            for key, url, page_url, depth, kind in rows:
+                token = uuid.uuid4().hex
+                db.execute(
+                    'UPDATE urls SET state = ?, token = ?, worker = ?, expires = ? WHERE key = ?',
+                    (LEASED, token, worker, now + ttl, key)
+                )
+                leases.append(Lease(url, page_url, depth, kind, token))
+        return leases
+
+    def complete(self, lease: Lease, *, links: Iterable[Link] = (), assets: Iterable[Link] = (), media: Iterable[Link] = ()) -> bool:
+        with self.transaction() as db:
+            cursor = db.execute(
+                'UPDATE urls SET state = ?, token = NULL, expires = NULL, error = NULL '
+                'WHERE key = ? AND token = ? AND state = ?',
+                (DONE, self.key(lease.url), lease.token, LEASED)
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._add(db, links, PAGE)
+            self._add(db, assets, ASSET)
+            self._add(db, media, MEDIA)
+        return True
+
+    def fail(self, lease: Lease, error: str, retries: int) -> bool:
+        with self.transaction() as db:
+            cursor = db.execute(
+                'UPDATE urls SET state = CASE WHEN attempts + 1 > ? THEN ? ELSE ? END, '
+                'attempts = attempts + 1, error = ?, token = NULL, expires = NULL '
+                'WHERE key = ? AND token = ? AND state = ?',
+                (retries, FAILED, PENDING, error, self.key(lease.url), lease.token, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        counts = {}
+        for kind, state, count in self.db.execute('SELECT kind, state, count(*) FROM urls GROUP BY kind, state'):
+            counts.setdefault(kind, {})[state] = count
+        return counts
+
+    def finished(self) -> bool:
+        row = self.db.execute('SELECT 1 FROM urls WHERE state IN (?, ?) LIMIT 1', (PENDING, LEASED)).fetchone()
+        return row is None
+
+    @staticmethod
+    def _owned(db: sqlite3.Connection, path: str) -> bool:
+        return db.execute('SELECT 1 FROM paths WHERE path = ? AND alias = 0', (path,)).fetchone() is not None
+
+    def assign_paths(self, links: Iterable[Link]) -> Dict[str, str]:
+        paths = {}
+        with self.transaction() as db:
+            for link in links:
+                key = self.key(str(link))
+                row = db.execute('SELECT path FROM paths WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    paths[key] = row[0]
+                    continue
+                path = link.relative
+                if self._owned(db, path):           # numbered like ``PathIndex.unique``
+                    stem, suffix = os.path.splitext(path)
+                    number = 2
+                    while self._owned(db, f'{stem}-{number}{suffix}'):
+                        number += 1
+                    path = f'{stem}-{number}{suffix}'
+                db.execute('INSERT INTO paths (key, path) VALUES (?, ?)', (key, path))
+                paths[key] = path
+        return paths
+
+    def alias_path(self, link: Link, path: str) -> str:
+        key = self.key(str(link))
+        with self.transaction() as db:
+            row = db.execute('SELECT path FROM paths WHERE key = ?', (key,)).fetchone()
+            db.execute('INSERT OR REPLACE INTO paths (key, path, alias) VALUES (?, ?, 1)', (key, path))
+        return row[0] if row is not None else None
+
+    def paths(self) -> Dict[str, str]:
+        return dict(self.db.execute('SELECT key, path FROM paths'))
+
+
+class FrontierPathIndex(PathIndex):
+    '''A ``PathIndex`` whose paths are handed out by a frontier
+
+    every worker of a crawl then saves a url to the same path and rewrites
+    the links to it the same way, numbered paths (``login-2.html``)
+    included. Paths are cached once known, they never change.
+
+    Attributes
+    ----------
+    frontier (Frontier)
+        the frontier of the crawl
+    '''
+
+    def __init__(self, frontier: Frontier) -> None:
+        super().__init__(canonicalize=frontier.canonicalize)
+        self.frontier = frontier
+
+    def _record(self, paths: Dict[str, str]):
+        with self._lock:
+            self.paths.update(paths)
+            for key, path in paths.items():
+                self.owners.setdefault(path, key)
+
+    def add(self, link: Link) -> str:
+        paths = self.frontier.assign_paths([link])
+        self._record(paths)
+        return paths[self.key(link)]
+
+    def update(self, links: List[Link]):
+        '''assigns the paths of every new link in one transaction'''
+        missing = [link for link in links if self.key(link) not in self.paths]
+        if missing:
+            self._record(self.frontier.assign_paths(missing))
+
+    def alias(self, link: Link, target: Link) -> str:
+        path = self.path_for(target)
+        previous = self.frontier.alias_path(link, path)
+        with self._lock:
+            self.paths[self.key(link)] = path
+        return previous
+
+    def load(self):
+        '''reads the paths given by every worker, e.g before ``export``'''
+        self._record(self.frontier.paths())
+
+
+def seed(site: Site, frontier: Frontier) -> int:
+    '''adds the homepage, and with ``use_sitemaps`` the sitemap pages, to the frontier'''
+    if site.use_sitemaps:
+        site.seed()
+    homepage = Link(site.base_url, page_url=site.base_url, base_url=site.base_url)
+    return frontier.add([homepage, *site.site_links], PAGE)
+
+
+def process(site: Site, frontier: Frontier, lease: Lease) -> bool:
+    '''fetches and saves one leased url, reporting what it links to'''
+    link = lease.link(site.base_url)
+    try:
+        if lease.kind == PAGE:
+            try:
+                page = Page(link, session=site.session, **site.page_options)
+            except NotHTMLError as e:
+                site.save_file_link(link, e)
+                return frontier.complete(lease)
+            assets = site.assets_of(page)
+            site.index.update([link, *assets, *page.get_links()])
+            site.file_saved(page.download())
+            links = [] if site.single_page else [
+                next_link for next_link in page.get_links() if validate_url(str(next_link))
+            ]
+            media = page.get_media() if site.include_media and not site.images_only else []
+            media_urls = {str(asset) for asset in media}
+            assets = [asset for asset in assets if str(asset) not in media_urls]
+            print('++ {}'.format(lease.url))
+            return frontier.complete(lease, links=links, assets=assets, media=media)
+
+        if not (lease.kind == MEDIA and site.download_media(link, site.session)):
+            file = Page.get(lease.url, session=site.session, limits=site.limits, bandwidth=site.bandwidth)
+            site.save_asset(link, file)
+        return frontier.complete(lease)
+    except FileAlreadyExists:
+        return frontier.complete(lease)
+    except Exception as e:
+        logger.exception(f'-- failed {lease.url}', exc_info=e)
+        print('--', lease.url)
+        return frontier.fail(lease, f'{e.__class__.__name__}: {e}', site.failures.retries_for(e))
+
+
+def work(site: Site, frontier: Frontier, *, worker: str = None, batch: int = BATCH, idle: float = IDLE) -> int:
+    '''processes leased urls until the frontier is finished, returning how many
+
+    the paths of ``site`` are handed out by the frontier, see ``FrontierPathIndex``
+    '''
+    if getattr(site.index, 'frontier', None) is not frontier:
+        site.index = FrontierPathIndex(frontier)
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    processed = 0
+    while True:
+        leases = frontier.lease(worker, batch)
+        if not leases:
+            if frontier.finished():
+                return processed
+            time.sleep(idle)        # other workers hold the remaining urls
+            continue
+        for lease in leases:
+            process(site, frontier, lease)
+            processed += 1
+
+
+def run_worker(frontier: Frontier, url: str, options: dict):
+    '''the entry point of a worker process'''
+    work(Site(url, **options), frontier)
+
+
+def crawl(site: Site, frontier: Frontier, *, workers: int = WORKERS, options: dict = None, idle: float = IDLE):
+    '''coordinates a distributed crawl of ``site``
+
+    the frontier is seeded and ``workers`` local processes are started,
+    each building its own ``Site`` from ``options``. Other processes of the
+    same host may join with ``work`` at any time. Returns once every url is
+    done or failed, with ``STATS`` counted from the frontier
+    '''
+    seed(site, frontier)
+    context = multiprocessing.get_context()
+    processes = [
+        context.Process(target=run_worker, args=(frontier, site.base_url, options or {}), daemon=True)
+        for _ in range(workers)
+    ]
+    for process_ in processes:
+        process_.start()
+    while not frontier.finished():
+        if processes and not any(process_.is_alive() for process_ in processes):
+            work(site, frontier, idle=idle)     # every local worker died, finish the crawl here
+        time.sleep(idle)
+    for process_ in processes:
+        process_.join()
+
+    counts = frontier.counts()
+    STATS['pages'] = counts.get(PAGE, {}).get(DONE, 0)
+    STATS['assets'] = counts.get(ASSET, {}).get(DONE, 0) + counts.get(MEDIA, {}).get(DONE, 0)
+    STATS['errors'] = sum(kind.get(FAILED, 0) for kind in counts.values())
+    return counts
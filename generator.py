@@ -1,12 +1,82 @@
 '''module for generating all the css files linked to a html page'''
 
 import re
+import html as htmllib
 from bs4 import BeautifulSoup as bs4
 from io import BytesIO, TextIOWrapper
-from typing import Union, List
+from typing import Union, List, Tuple
 
 from exceptions import InvalidInputError
 from models import Link, url_pattern
+from rules import LinkRules
+
+font_face_pattern = re.compile(r'@font-face\s*{[^}]*}', re.IGNORECASE)
+
+
+def parse_srcset(srcset: str) -> List[Tuple[str, str]]:
+    '''splits a ``srcset`` attribute into (url, descriptor) candidates
+
+    e.g ``"a.jpg 1x, b.jpg 480w"`` gives ``[('a.jpg', '1x'), ('b.jpg', '480w')]``
+    '''
+    candidates = []
+    position, length = 0, len(srcset)
+    while position < length:
+        while position < length and (srcset[position].isspace() or srcset[position] == ','):
+            position += 1
+        start = position
+        while position < length and not srcset[position].isspace():
+            position += 1
+        url, descriptor = srcset[start:position], ''
+        if url.endswith(','):
+            url = url.rstrip(',')
+        else:
+            end = srcset.find(',', position)
+            end = length if end == -1 else end
+            descriptor = srcset[position:end].strip()
+            position = end + 1
+        if url:
+            candidates.append((url, descriptor or '1x'))
+    return candidates
+
+
+IMAGE_POLICIES = ('all', 'largest', 'smallest', 'max-width=N')
+
+
+def parse_image_policy(policy: str) -> Tuple[str, int]:
+    '''validates an image policy returning its name and width limit'''
+    if policy in ('all', 'largest', 'smallest'):
+        return policy, None
+    name, _, width = (policy or '').partition('=')
+    if name == 'max-width' and width.isdigit():
+        return name, int(width)
+    raise InvalidInputError(f'image policy must be one of {", ".join(IMAGE_POLICIES)}')
+
+
+def descriptor_size(descriptor: str) -> float:
+    '''the width (``480w``) or pixel density (``2x``) of a srcset candidate'''
+    try:
+        return float(descriptor[:-1]) if descriptor[-1:] in ('w', 'x') else 1.0
+    except ValueError:
+        return 1.0
+
+
+def choose_candidates(candidates: List[Tuple[str, str]], policy: str) -> List[Tuple[str, str]]:
+    '''picks the srcset candidates to download according to ``policy``
+
+    ``max-width=N`` takes the widest candidate no wider than ``N`` pixels,
+    or the narrowest one if they are all wider
+    '''
+    name, width = parse_image_policy(policy)
+    if name == 'all' or not candidates:
+        return candidates
+
+    by_size = sorted(candidates, key=lambda candidate: descriptor_size(candidate[1]))
+    if name == 'largest':
+        return by_size[-1:]
+    if name == 'smallest':
+        return by_size[:1]
+    fitting = [c for c in by_size if not c[1].endswith('w') or descriptor_size(c[1]) <= width]
+    return fitting[-1:] or by_size[:1]
 
 class Parser:
     '''A class which generates static files and links from a html page
@@ -21,6 +91,14 @@ class Parser:
         True if page is html root tag
     base_url (str)
         the base url of the page site
+    rules (LinkRules)
+        the include/exclude rules applied to the page links
+    depth (int)
+        number of hops from the homepage to the page
+    image_policy (str)
+        which ``srcset`` candidates to download, one of ``IMAGE_POLICIES``
+    transforms (dict)
+        byte replacements to apply to the page, e.g the trimmed ``srcset``s
     
     
     Methods
@@ -42,7 +120,10 @@ class Parser:
             *,
             html: Union[str, bytes],
             page_url: str,
-            base_url: str
+            base_url: str,
+            rules: LinkRules = None,
+            depth: int = 0,
+            image_policy: str = 'all'
         ) -> None:
         if isinstance(html, (str, bytes, BytesIO, TextIOWrapper)):
             self.page = bs4(html, 'html.parser')
@@ -52,13 +133,19 @@ class Parser:
             raise InvalidInputError()
         self.base_url = base_url
         self.page_url = page_url
+        self.rules = rules
+        self.depth = depth
+        self.image_policy = image_policy
+        parse_image_policy(image_policy)
         self.transforms = {}
 
-    def url_to_links(self, urls: List[str]) -> List[Link]:
+    def url_to_links(self, urls: List[str], rules: LinkRules = None, depth: int = None) -> List[Link]:
         return Link.url_to_links(
             urls=urls,
             page_url=self.page_url,
-            base_url=self.base_url
+            base_url=self.base_url,
+            rules=rules,
+            depth=self.depth if depth is None else depth
         )
     
     
@@ -68,7 +155,7 @@ class Parser:
         links = self.page.find_all('a')
         links = [link['href'] for link in links if link.get('href', None)]
 
-        return self.url_to_links(links)
+        return self.url_to_links(links, rules=self.rules, depth=self.depth + 1)
     
     def get_cssjs(self) -> List[Link]:
         '''generates the page css and js files
@@ -94,15 +181,54 @@ class Parser:
         return self.url_to_links(urls=[*stylesheets, *scripts])
     
     def get_images(self) -> List[Link]:
-        '''generates all the images in a html page'''
+        '''generates all the images in a html page
 
+        Unless ``image_policy`` is ``all``, only the chosen candidate of each
+        ``srcset`` is returned, the attribute is trimmed down to it in
+        ``transforms`` and the ``src`` fallback of such images points to it
+        too instead of being downloaded
+        '''
+        select_all = self.image_policy == 'all'
         images = self.page.find_all('img')
-        images = [image['src'] for image in images if image.get('src', None)]
+        images = [
+            image['src'] for image in images
+            if image.get('src', None) and (select_all or not image.get('srcset', None))
+        ]
         ims = [img['href'] for img in self.page.find_all('link') if 'icon' in img.get('rel', [])]
-        assets = images + ims
+        responsive = []
+        for tag in self.page.select('img[srcset], picture > source[srcset]'):
+            srcset = tag['srcset']
+            chosen = choose_candidates(parse_srcset(srcset), self.image_policy)
+            responsive.extend(url for url, _ in chosen)
+            if not select_all and chosen:
+                self.add_transform(srcset, chosen[0][0])
+                if tag.name == 'img' and tag.get('src', None):
+                    self.add_attribute_transform('src', tag['src'], chosen[0][0])
+        assets = images + ims + responsive
         
         return self.url_to_links(assets)
+
+    def add_transform(self, old: str, new: str):
+        '''records a replacement of an attribute value in the page source'''
+        for value in {old, htmllib.escape(old, quote=False), htmllib.escape(old)}:
+            self.transforms[value.encode('utf8')] = new.encode('utf8')
+
+    def add_attribute_transform(self, name: str, old: str, new: str):
+        '''records a replacement of the value of the ``name`` attribute only, quotes included'''
+        for value in {old, htmllib.escape(old, quote=False), htmllib.escape(old)}:
+            for quote in ('"', "'"):
+                self.transforms[f'{name}={quote}{value}{quote}'.encode('utf8')] = f'{name}={quote}{new}{quote}'.encode('utf8')
     
     def get_media(self) -> List[Link]:
         '''generates all media assets link fonts and videos'''
-        return []
\ No newline at end of file
+        media = []
+        for tag in self.page.select('video, audio, video > source, audio > source, track'):
+            media.extend(tag[attr] for attr in ('src', 'poster') if tag.get(attr, None))
+            if tag.get('srcset', None):
+                media.extend(url for url, _ in parse_srcset(tag['srcset']))
+
+        for style in self.page.find_all('style'):
+            for font_face in re.findall(font_face_pattern, style.get_text()):
+                media.extend(match[1] for match in re.findall(url_pattern, font_face))
+
+        return self.url_to_links(media)
\ No newline at end of file
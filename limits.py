@@ -0,0 +1,107 @@
+'''content type routing and size caps checked before a body is read'''
+
+from typing import Callable, Mapping
+
+from exceptions import ContentTooLargeError
+
+MB = 1024 ** 2
+MAX_SIZE = 1024 * MB
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+
+# per content type caps, a key ending with ``/`` applies to the whole major type
+TYPE_LIMITS = {
+    'text/html': 20 * MB,
+    'application/xhtml+xml': 20 * MB,
+    'text/css': 10 * MB,
+    'application/javascript': 20 * MB,
+    'text/javascript': 20 * MB,
+    'image/': 50 * MB,
+    'font/': 10 * MB,
+}
+
+BLOCK_SIZE = 64 * 1024
+
+
+def content_type(headers: Mapping[str, str]) -> str:
+    '''returns the mime type of a response without its parameters'''
+    return (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+
+
+def is_html(mime_type: str) -> bool:
+    '''checks if a response should be parsed as a page
+
+    responses without a content type are assumed to be html
+    '''
+    return not mime_type or mime_type in HTML_TYPES
+
+
+class SizeLimits:
+    '''Byte caps for downloads, per content type and overall
+
+    ...
+
+    Attributes
+    ----------
+    limits (dict)
+        the caps per content type, see ``TYPE_LIMITS``
+    max_size (int)
+        the cap applied to every download
+    '''
+
+    def __init__(self, limits: Mapping[str, int] = None, *, max_size: int = MAX_SIZE) -> None:
+        self.limits = dict(TYPE_LIMITS if limits is None else limits)
+        self.max_size = max_size
+
+    def limit_for(self, mime_type: str) -> int:
+        limit = self.limits.get(mime_type)
+        if limit is None and '/' in mime_type:
+            limit = self.limits.get(mime_type.split('/')[0] + '/')
+        return min(limit, self.max_size) if limit is not None else self.max_size
+
+    def check(self, url: str, headers: Mapping[str, str]) -> int:
+        '''checks the announced size of a response, returning the cap for its body'''
+        limit = self.limit_for(content_type(headers))
+        length = headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > limit:
+            raise ContentTooLargeError(f'{url} is {length} bytes, the limit is {limit}')
+        return limit
+
+
+def read_body(
+        url: str,
+        response,
+        limits: SizeLimits = None,
+        on_chunk: Callable[[bytes], None] = None,
+        bandwidth=None
+    ) -> bytes:
+    '''reads a streamed response body, aborting as soon as it passes its cap
+
+    ``on_chunk`` is called with every chunk as it arrives and the body is
+    kept on the response so ``response.content`` still works. The chunks
+    are read no faster than ``bandwidth`` allows, see ``scheduler.TokenBucket``
+    '''
+    try:
+        limit = limits.check(url, response.headers) if limits is not None else None
+    except ContentTooLargeError:
+        response.close()            # hands the connection back to the pool
+        raise
+    if getattr(response, 'raw', None) is None:     # the body is already loaded
+        body = response.content or b''
+        if limit is not None and len(body) > limit:
+            raise ContentTooLargeError(f'{url} is over {limit} bytes')
+        return body
+
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(BLOCK_SIZE):
+        size += len(chunk)
+        if limit is not None and size > limit:
+            response.close()
+            raise ContentTooLargeError(f'{url} is over {limit} bytes')
+        chunks.append(chunk)
+        if bandwidth is not None:
+            bandwidth.consume(len(chunk))
+        if on_chunk is not None:
+            on_chunk(chunk)
+    response._content = b''.join(chunks)
+    return response._content
@@ -7,51 +7,232 @@ import logging
 from pathlib import Path
 import shutil
 
-from url_parser import get_url
+# requests, bs4 and the crawler are imported where they are used so that
+# ``--help`` and invalid command lines return without loading them
+from utils import validate_url
+from exceptions import InvalidInputError
 
-from sites import Site, STATS
-from utils import validate_url, export
 
-
-logging.basicConfig(filename='export/process.log', level=logging.ERROR, filemode='w')
 logger = logging.getLogger(__name__)
 
+# options given to ``main`` as they are
+PASSED_OPTIONS = (
+    'user', 'password', 'warc_dir', 'warc_size', 'use_sitemaps', 'include_media',
+    'single_page', 'images_only', 'image_policy', 'streaming', 'near_duplicates',
+    'failure_cache', 'archive_format', 'store_media', 'jobs', 'manifest',
+    'frontier_db', 'workers', 'size_cache', 'probe_sizes', 'optimize', 'optimize_cache',
+    'sidecars',
+)
+# options given to ``Site``
+SITE_OPTIONS = (
+    'user', 'password', 'use_sitemaps', 'include_media', 'single_page', 'images_only',
+    'image_policy', 'streaming', 'near_duplicates', 'limits', 'canonicalize', 'rules',
+    'probe_sizes', 'bandwidth',
+)
+# options the workers of a distributed crawl do not support, by their flag
+FRONTIER_UNSUPPORTED = (
+    ('warc_dir', '--warc'), ('near_duplicates', '--near-duplicates'),
+    ('failure_cache', '--failure-cache'), ('size_cache', '--size-cache'),
+)
+OPTIONS = (
+    *PASSED_OPTIONS, 'max_size', 'strip_param', 'strip_trailing_slash',
+    'include', 'exclude', 'exclude_path', 'max_depth', 'bandwidth',
+)
+
     
-def main(url, **kwargs):
-    base_dir = os.getcwd()
+def main(
+        url,
+        warc_dir=None,
+        warc_size=1024,
+        failure_cache=None,
+        archive_format='zip',
+        jobs=None,
+        store_media=False,
+        manifest=None,
+        base_dir=None,
+        frontier_db=None,
+        workers=None,
+        size_cache=None,
+        reachable=None,
+        optimize=False,
+        optimize_cache=None,
+        sidecars=False,
+        **kwargs
+    ):
+    '''clones ``url`` and archives it in ``base_dir``, returning the archive filename
+
+    the clone runs in ``<base_dir>/exports``, which is the working directory
+    of the process until it is done. With ``frontier_db`` the crawl is shared
+    with ``workers`` local processes (and any ``join``-ed worker) through a
+    SQLite frontier, see ``frontier.crawl``. An existing ``frontier_db``
+    is an interrupted crawl, which is resumed; it is removed once archived.
+    ``reachable`` is a future of the ``ping`` of ``url`` running alongside
+    the crawl, the clone fails if it is false and no page could be fetched.
+    With ``optimize`` the saved files are minified and recompressed in
+    ``jobs`` processes before archiving, see ``optimize.Optimizer``.
+    The ``bandwidth`` of a distributed crawl is split evenly between its
+    local workers
+    '''
+    from url_parser import get_url
+    from sites import Site, STATS
+    from archive import make_archive
+    from warc import WARCWriter
+    from failures import FailureCache
+    from frontier import SQLiteFrontier, FrontierPathIndex, crawl, WORKERS
+    from scheduler import SizeCache, TokenBucket
+    from optimize import Optimizer
+
+    base_dir = base_dir or os.getcwd()
+    STATS.update(dict.fromkeys(STATS, 0))
     export_dir = os.path.join(base_dir, 'exports')
     sitename = get_url(url).domain
     location = os.path.join(export_dir, sitename)
+    frontier_path = os.path.join(base_dir, frontier_db) if frontier_db else None
+    resume = frontier_path is not None and Path(frontier_path).exists()
 
 
-    if Path(export_dir).exists():
+    if Path(export_dir).exists() and not resume:
         shutil.rmtree(export_dir)
     Path(export_dir).mkdir(parents=True, exist_ok=True,mode=0o777)
     Path(location).mkdir(parents=True, mode=0o777, exist_ok=True)
     os.chdir(location)
 
-    site = Site(url, export_dir=export_dir, **kwargs)
-    site.clone()
+    warc = None
+    if warc_dir:
+        warc = WARCWriter(os.path.join(base_dir, warc_dir), prefix=sitename, max_size=warc_size * 1024 ** 2)
+
+    failures = FailureCache(path=os.path.join(base_dir, failure_cache)) if failure_cache else None
+    sizes = SizeCache(path=os.path.join(base_dir, size_cache)) if size_cache else None
+    optimizer = None
+    if optimize or sidecars:
+        optimizer = Optimizer(
+            jobs=jobs, minify=optimize, sidecars=sidecars, cache_dir=os.path.join(base_dir, optimize_cache) if optimize_cache else None
+        )
+
+    # the worker processes of a distributed crawl have no optimizer, their files are optimized once it is done
+    site = Site(url, export_dir=export_dir, warc=warc, failures=failures, sizes=sizes,
+                optimizer=None if frontier_db else optimizer, **kwargs)
+    optimized = (0, 0)
+    try:
+        if frontier_db:
+            frontier = SQLiteFrontier(frontier_path, canonicalize=site.canonicalize)
+            site.index = FrontierPathIndex(frontier)
+            options = {key: value for key, value in kwargs.items() if key != 'session'}
+            workers = workers or WORKERS
+            if options.get('bandwidth'):
+                # every worker process gets its own copy of the bucket
+                options['bandwidth'] = TokenBucket(options['bandwidth'].rate / workers, options['bandwidth'].burst / workers)
+            try:
+                crawl(site, frontier, workers=workers, options=options)
+                site.index.load()           # the paths given by every worker, for the manifest
+            finally:
+                frontier.close()
+            if optimizer is not None:
+                optimizer.optimize_tree(location)
+        else:
+            site.clone()
+    finally:
+        if optimizer is not None:
+            optimized = optimizer.close()
+        if warc is not None:
+            warc.close()
+        site.failures.save()
+        site.sizes.save()
+    if manifest:
+        site.index.export(os.path.join(base_dir, manifest))
     os.chdir(base_dir)
+    if reachable is not None and not STATS['pages'] and not result_of(reachable):
+        shutil.rmtree(location)
+        raise InvalidInputError('URL failed validation')
 
     print('\n\n')
     print(f'Pages Downloaded: {STATS["pages"]}')
     print(f'Static Assets Downloaded: {STATS["assets"]}')
     print(f'Errors Encountered: {STATS["errors"]}')
+    print(f'Near Duplicates Skipped: {STATS["duplicates"]}')
+    if optimizer is not None:
+        print(f'Optimized: {optimized[0] // 1024} KB -> {optimized[1] // 1024} KB')
     print("\n\n")
 
-    print(f"Exporting site to {sitename}.zip ...")
-    shutil.make_archive(sitename, format='zip', root_dir=export_dir)
+    print(f"Exporting site to {sitename}.{archive_format} ...")
+    filename = make_archive(os.path.join(base_dir, sitename), export_dir, archive_format, jobs=jobs, store_media=store_media)
     shutil.rmtree(location)
+    if frontier_path:
+        SQLiteFrontier.remove(frontier_path)
     print(f"site exported successfully\n\n")
-    
+    return filename
+
+
+def result_of(future) -> bool:
+    try:
+        return bool(future.result())
+    except Exception:
+        return False
 
-    # return zipped
+
+def join(url, frontier_db, base_dir=None, **kwargs):
+    '''works on the crawl of ``url`` coordinated by another ``main``
+
+    files are saved to ``<base_dir>/exports/<site>``, which should be the
+    export folder of the coordinator. The SQLite frontier only works for
+    processes of the same host, see ``frontier.SQLiteFrontier``
+    '''
+    from url_parser import get_url
+    from frontier import SQLiteFrontier, run_worker
+    from dedupe import URLCanonicalizer
+
+    base_dir = base_dir or os.getcwd()
+    location = os.path.join(base_dir, 'exports', get_url(url).domain)
+    Path(location).mkdir(parents=True, mode=0o777, exist_ok=True)
+    os.chdir(location)
+    frontier = SQLiteFrontier(os.path.join(base_dir, frontier_db), canonicalize=kwargs.get('canonicalize') or URLCanonicalizer())
+    run_worker(frontier, url, kwargs)
+    os.chdir(base_dir)
+
+
+def build_params(options: dict) -> dict:
+    '''turns the command line options into the keyword arguments of ``main``
+
+    options which are not given keep their default
+    '''
+    from archive import FORMATS
+    from rules import LinkRules
+    from limits import SizeLimits, MB
+    from dedupe import URLCanonicalizer, TRACKING_PARAMS
+    from scheduler import TokenBucket
+
+    options = {key: value for key, value in options.items() if value is not None}
+    if bool(options.get('user')) != bool(options.get('password')):
+        raise InvalidInputError('user or password missing in authentication credentials')
+    params = {key: options[key] for key in PASSED_OPTIONS if key in options}
+    if params.get('archive_format', 'zip') not in FORMATS:
+        raise InvalidInputError(f'archive format must be one of {", ".join(FORMATS)}')
+    if options.get('frontier_db'):
+        unsupported = [flag for key, flag in FRONTIER_UNSUPPORTED if options.get(key) is not None]
+        if unsupported:
+            raise InvalidInputError(f'{", ".join(unsupported)} cannot be used with --frontier')
+    if options.get('bandwidth'):
+        params['bandwidth'] = TokenBucket(options['bandwidth'] * 1024)
+    if options.get('max_size'):
+        params['limits'] = SizeLimits(max_size=options['max_size'] * MB)
+    if options.get('strip_param') or options.get('strip_trailing_slash'):
+        params['canonicalize'] = URLCanonicalizer(
+            strip_params=[*TRACKING_PARAMS, *options.get('strip_param', [])],
+            strip_trailing_slash=options.get('strip_trailing_slash', False)
+        )
+    if options.get('include') or options.get('exclude') or options.get('exclude_path') or 'max_depth' in options:
+        params['rules'] = LinkRules(
+            include=options.get('include', []),
+            exclude=options.get('exclude', []),
+            exclude_paths=options.get('exclude_path', []),
+            max_depth=options.get('max_depth')
+        )
+    return params
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(prog='pyclone', description='Clones a website given the url')
-    parser.add_argument('url', help='The link to the website you want to clone')
+    parser.add_argument('url', nargs='?', help='The link to the website you want to clone')
     # parser.add_argument('--filter',
     #     required=False,
     #     type=str,
@@ -62,18 +243,79 @@ if __name__ == '__main__':
     parser.add_argument('--user', required=False, help='The username or password to use for authentication')
     parser.add_argument('--password', required=False, help='Password for basic authentication')
     parser.add_argument('--images-only', required=False, default=False, help='Download images only')
+    parser.add_argument('--image-policy', required=False, default='all', help='srcset candidates to download: all, largest, smallest or max-width=N')
+    parser.add_argument('--media', dest='include_media', action='store_true', help='Also download videos, audio and fonts')
+    parser.add_argument('--stream', dest='streaming', action='store_true', help='Queue the assets of a page while it is still downloading')
+    parser.add_argument('--sitemaps', dest='use_sitemaps', action='store_true', help='Seed the crawl from robots.txt and sitemap.xml')
+    parser.add_argument('--include', action='append', default=[], help='Only crawl pages whose link matches this regex (repeatable)')
+    parser.add_argument('--exclude', action='append', default=[], help='Never crawl pages whose link matches this regex (repeatable)')
+    parser.add_argument('--exclude-path', action='append', default=[], help='Never crawl pages under this path, e.g /calendar (repeatable)')
+    parser.add_argument('--max-depth', required=False, type=int, help='Maximum number of links to follow from the homepage')
+    parser.add_argument('--strip-param', action='append', default=[], help='Ignore this query parameter when telling pages apart, globs allowed (repeatable)')
+    parser.add_argument('--strip-trailing-slash', action='store_true', help='Treat /about/ and /about as the same page')
+    parser.add_argument('--near-duplicates', required=False, type=int, nargs='?', const=3, help='Skip pages whose content is within this many bits (default: 3) of a page already cloned')
+    parser.add_argument('--max-size', required=False, type=int, help='Skip any file larger than this many MB')
+    parser.add_argument('--bandwidth', required=False, type=int, help='Cap the download rate of the clone to this many KB/s, split evenly between the --workers with --frontier')
+    parser.add_argument('--size-cache', required=False, help='JSON file remembering the size of every file between runs, small files are downloaded first')
+    parser.add_argument('--probe-sizes', action='store_true', help='Ask the size of unknown files with a HEAD request before downloading them')
+    parser.add_argument('--archive-format', required=False, default='zip', help='Format of the exported archive: zip or tar.zst')
+    parser.add_argument('--store-media', action='store_true', help='Store images, videos and fonts in the zip without compressing them again')
+    parser.add_argument('--jobs', required=False, type=int, help='Number of processes used to compress the archive (default: all cores)')
+    parser.add_argument('--optimize', action='store_true', help='Minify the html, css and js and recompress the png and jpeg files before archiving')
+    parser.add_argument('--optimize-cache', required=False, help='Folder keeping the optimized files by content hash, so unchanged files are not processed again')
+    parser.add_argument('--sidecars', action='store_true', help='Also write precompressed .gz (and .br, with brotli installed) copies of the text files')
+    parser.add_argument('--manifest', required=False, help='Write a JSON map of every url to its path in the export')
+    parser.add_argument('--failure-cache', required=False, help='JSON file remembering failed urls between runs')
+    parser.add_argument('--warc', required=False, dest='warc_dir', help='Also record the raw http exchanges as WARC files in this folder')
+    parser.add_argument('--warc-size', required=False, type=int, default=1024, help='Size in MB after which a new WARC file is started')
+    parser.add_argument('--frontier', required=False, dest='frontier_db', help='SQLite file holding the crawl frontier, shared with the worker processes (not with --warc, --near-duplicates, --failure-cache or --size-cache)')
+    parser.add_argument('--workers', required=False, type=int, help='Number of local worker processes with --frontier (default: 4)')
+    parser.add_argument('--worker', action='store_true', help='Only work on the crawl of an existing --frontier from another process of this host, the files land in ./exports')
+    parser.add_argument('--check', action='store_true', help='Only check that the url is valid and online')
+    parser.add_argument('--serve', required=False, metavar='DIR', help='Run as a clone service keeping its jobs in this folder, see service.py')
+    parser.add_argument('--host', required=False, default='127.0.0.1', help='Address the service listens on')
+    parser.add_argument('--port', required=False, type=int, default=8765, help='Port the service listens on')
+    parser.add_argument('--socket', required=False, help='Unix socket the service listens on instead of a port')
 
     arguments = parser.parse_args()
+    logging.basicConfig(filename='process.log', level=logging.ERROR, filemode='w')
+    if arguments.serve:
+        from service import serve
+        serve(arguments.serve, host=arguments.host, port=arguments.port, socket_path=arguments.socket)
+        sys.exit(0)
+    if not arguments.url:
+        parser.error('the url is required')
+
     url = arguments.url
-    params = {}
-    if (arguments.user or arguments.password) and not (arguments.user and arguments.password):
-        sys.exit('user or password missing in authentication credentials')
-    else:
-        params['user'] = arguments.user
-        params['password'] = arguments.password
-
-    if not validate_url(url, check_if_exist=True):
+    if not validate_url(url):
         sys.exit('URL failed validation')
+    if arguments.check:
+        from utils import ping
+        try:
+            online = ping(url)
+        except Exception:
+            online = False
+        sys.exit(0 if online else 'URL is not online')
+    try:
+        params = build_params(vars(arguments))
+    except InvalidInputError as e:
+        sys.exit(str(e))
+
+    if arguments.worker:
+        if not arguments.frontier_db:
+            parser.error('--worker requires --frontier')
+        site_params = {key: value for key, value in params.items() if key in SITE_OPTIONS}
+        join(url, arguments.frontier_db, **site_params)
+        sys.exit(0)
 
-    file = main(url, **params)
-    sys.exit(0)
\ No newline at end of file
+    # the reachability check runs alongside the first fetches instead of before them
+    from concurrent.futures import ThreadPoolExecutor
+    from utils import ping
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        file = main(url, reachable=pool.submit(ping, url), **params)
+    except InvalidInputError as e:
+        sys.exit(str(e))
+    finally:
+        pool.shutdown(wait=False)       # the clone is done, its result is no longer needed
+    sys.exit(0)
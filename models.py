@@ -2,15 +2,19 @@
 
 import os
 import re
+import sys
+import json
+import threading
 from pathlib import Path
 from urllib.parse import urlparse, urlunparse
 from enum import Enum
-from typing import List
+from typing import Callable, Dict, List
 
 from url_parser import get_url
 
 from utils import is_file_path
 from exceptions import InvalidInputError
+from rules import LinkRules, EXCLUDED_LINKS, EXCLUDED_PREFIXES, EXCLUDED_PATTERN
 
 
 url_pattern = re.compile(
@@ -31,11 +35,27 @@ class Link:
     used to resolve and convert to absolute url
     ...
 
+    Links are kept compact for large crawls: no instance ``__dict__``,
+    the url strings are interned so the thousands of links found on
+    a page share one copy of ``page_url`` and ``base_url``, and the
+    normalized url and file path are computed once then cached.
+
     Attributes
     ---------
-
+    link (str)
+        the link as found in the page
+    page_url (str)
+        the url of the page the link was found on
+    base_url (str)
+        the base url of the site
+    type (LinkType)
+        whether the link is absolute, relative or a query
+    depth (int)
+        number of hops from the homepage to the link
     '''
 
+    __slots__ = ('link', 'page_url', 'base_url', 'type', 'depth', '_url', '_relative')
+
     PAGE_SUFFIXES = ['.html', '.php', '.aspx', '.css', '.js', '.png', '.svg', '.jpg', '.jpeg']
 
     class LinkType(Enum):
@@ -43,15 +63,19 @@ class Link:
         RELATIVE = 2
         QUERY = 3
 
-    def __init__(self, link: str, *, page_url: str, base_url: str ) -> None:
-        self.link = link
-        self.page_url = page_url
+    def __init__(self, link: str, *, page_url: str, base_url: str, depth: int = 0) -> None:
+        self.link = sys.intern(link)
+        self.page_url = sys.intern(page_url)
         self.type = Link.get_link_type(self.link, base_url)
-        self.base_url = base_url or self.page_url
-        
+        self.base_url = sys.intern(base_url or self.page_url)
+        self.depth = depth
+        self._url = None
+        self._relative = None
 
     def __str__(self):
-        return self.normalize()
+        if self._url is None:
+            self._url = sys.intern(self.normalize())
+        return self._url
     
     def __repr__(self) -> str:
         return f'<Link: {str(self)}>'
@@ -104,7 +128,9 @@ class Link:
     
     @property
     def relative(self) -> str:
-        return self.url_to_path()
+        if self._relative is None:
+            self._relative = sys.intern(self.url_to_path())
+        return self._relative
     
     @property
     def is_css(self):
@@ -118,27 +144,18 @@ class Link:
             
     @staticmethod
     def is_internal(link, base_url):
-        '''checks if the link points to a seperate page in the same site'''
-        # link = Link.remove_fragment(link)
-        if any([
-            not link,
-            link in ['/', '#'],
-            link.startswith('//'),      # protocol relative urls
-            link.startswith('tel:'),
-            link.startswith('mailto:'),
-            'javascript:void' in link,
-            'data:image' in link, # for image links
-            ';base64' in link
-        ]):
+        '''checks if the link points to a seperate page in the same site
+
+        a link is internal if it is absolute, relative or a query link, i.e
+        it either starts with ``base_url`` or is not a full ``http`` url
+        '''
+        if (
+            link in EXCLUDED_LINKS
+            or link.startswith(EXCLUDED_PREFIXES)     # protocol relative urls, tel: and mailto:
+            or EXCLUDED_PATTERN.search(link)          # javascript and inline data
+        ):
             return False
-        
-        if any([
-            Link.is_absolute(link, base_url),
-            Link.is_relative(link, base_url),
-            Link.is_query(link, base_url)
-        ]):
-            return True
-        return False
+        return link.startswith(base_url) or not link.startswith('http')
     
     @staticmethod
     def is_absolute(link: str, base_url: str):
@@ -177,17 +194,32 @@ class Link:
         return urlunparse(parts._replace(fragment=''))
     
     @classmethod
-    def url_to_links(cls, urls: List[str], page_url: str, base_url: str) -> List:
+    def url_to_links(
+            cls,
+            urls: List[str],
+            page_url: str,
+            base_url: str,
+            rules: LinkRules = None,
+            depth: int = 0
+        ) -> List:
+        '''creates the links of the internal urls allowed by ``rules``'''
+        if rules is not None and not rules.allows_depth(depth):
+            return []
+
         links = []
         for link in set(urls):
             link = '#'.join(link.split('#')[:2])
 
-            if cls.is_internal(link, base_url):
-                links.append(cls(
-                    link=link,
-                    page_url=page_url,
-                    base_url=base_url
-                ))
+            if not cls.is_internal(link, base_url):
+                continue
+            if rules is not None and not rules.allows(link, base_url, page_url):
+                continue
+            links.append(cls(
+                link=link,
+                page_url=page_url,
+                base_url=base_url,
+                depth=depth
+            ))
         return links
     
     def __eq__(self, __o: object) -> bool:
@@ -197,5 +229,89 @@ class Link:
         return not str(self) == str(__o)
     
     def __hash__(self) -> int:
-        return super().__hash__()
-    
\ No newline at end of file
+        return hash(str(self))
+    
+
+
+class PathIndex:
+    '''A site wide map of urls to the relative path they are saved to
+
+    ...
+
+    Every url is converted with ``Link.url_to_path`` once, then every page
+    rewrite and file save is a dictionary lookup. Urls which would be saved
+    to the same path (e.g ``?page=1&sort=asc`` and ``?page=1&sort=desc``)
+    get a numbered path, ``page-2.html``, in the order they are added.
+    With ``canonicalize`` the urls are keyed by their canonical form, so
+    the variants of a page (e.g ``?utm_source=x``) share its path.
+
+    Attributes
+    ----------
+    paths (dict)
+        the path of every url
+    canonicalize (callable)
+        maps a url to its canonical form, see ``dedupe.URLCanonicalizer``
+    '''
+
+    def __init__(self, canonicalize: Callable[[str], str] = None) -> None:
+        self.canonicalize = canonicalize
+        self.paths: Dict[str, str] = {}
+        self.owners: Dict[str, str] = {}        # the url saved to each path
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, url: str):
+        return self.key(url) in self.paths
+
+    def key(self, url) -> str:
+        return self.canonicalize(str(url)) if self.canonicalize is not None else str(url)
+
+    def path_for(self, link: Link) -> str:
+        '''returns the path of a link, adding it to the index if needed'''
+        path = self.paths.get(self.key(link))
+        if path is None:
+            path = self.add(link)
+        return path
+
+    def alias(self, link: Link, target: Link) -> str:
+        '''saves ``link`` to the path of ``target``, e.g for a duplicate page
+
+        returns the path ``link`` had before, if any
+        '''
+        path = self.path_for(target)
+        with self._lock:
+            previous = self.paths.get(self.key(link))
+            self.paths[self.key(link)] = path
+        return previous
+
+    def add(self, link: Link) -> str:
+        url = self.key(link)
+        path = link.relative
+        with self._lock:
+            if url in self.paths:
+                return self.paths[url]
+            if self.owners.get(path, url) != url:
+                path = self.unique(path)
+            self.paths[url] = path
+            self.owners[path] = url
+        return path
+
+    def update(self, links: List[Link]):
+        for link in links:
+            if self.key(link) not in self.paths:
+                self.add(link)
+
+    def unique(self, path: str) -> str:
+        stem, suffix = os.path.splitext(path)
+        number = 2
+        while f'{stem}-{number}{suffix}' in self.owners:
+            number += 1
+        return f'{stem}-{number}{suffix}'
+
+    def export(self, filename: str) -> str:
+        '''writes the index as a json manifest of ``{url: path}``'''
+        with open(filename, 'w') as f:
+            json.dump(self.paths, f, indent=2, sort_keys=True)
+        return filename
@@ -0,0 +1,299 @@
+'''shrinks the files of a clone once they are saved
+
+html, css and js are minified, png and jpeg are recompressed losslessly and
+text files get precompressed ``.gz`` (and ``.br``) sidecars for servers
+which can send them as is. Every transform is skipped when it does not
+make the file smaller.
+'''
+
+import os
+import re
+import gzip
+import zlib
+import shutil
+import struct
+import hashlib
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HTML_SUFFIXES = frozenset(['.html', '.htm'])
+CSS_SUFFIXES = frozenset(['.css'])
+JS_SUFFIXES = frozenset(['.js', '.mjs'])
+# files worth precompressing, images and media are already compressed
+SIDECAR_SUFFIXES = frozenset(['.html', '.htm', '.css', '.js', '.mjs', '.svg', '.json', '.xml', '.txt', '.ico'])
+SIDECARS = ('.gz', '.br')
+MIN_SIDECAR_SIZE = 1024     # smaller files are sent faster as they are
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SUFFIXES = frozenset(['.jpg', '.jpeg'])
+TRANSFORM_SUFFIXES = HTML_SUFFIXES | CSS_SUFFIXES | JS_SUFFIXES | JPEG_SUFFIXES | {'.png'}
+
+raw_pattern = re.compile(rb'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+comment_pattern = re.compile(rb'<!--(?!\[if|<!|>).*?-->', re.DOTALL)
+space_pattern = re.compile(rb'\s+')
+tag_pattern = re.compile(rb'''(<[a-zA-Z/!?](?:"[^"]*"|'[^']*'|[^'">])*>)''')
+css_token_pattern = re.compile(rb'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)''', re.DOTALL)
+css_punctuation_pattern = re.compile(rb'\s*([{};,>])\s*')
+
+
+def minify_html(html: bytes) -> bytes:
+    '''drops comments and collapses whitespace outside of pre, textarea, script and style
+
+    tags are kept as they are, so attribute values are never changed
+    '''
+    parts = raw_pattern.split(html)
+    out = []
+    # split keeps the two groups: every raw element is followed by its tag name
+    for index in range(0, len(parts), 3):
+        text = comment_pattern.sub(b'', parts[index])
+        for position, part in enumerate(tag_pattern.split(text)):
+            out.append(part if position % 2 else space_pattern.sub(lambda m: b'\n' if b'\n' in m.group() else b' ', part))
+        if index + 1 < len(parts):
+            out.append(parts[index + 1])
+    return b''.join(out).strip()
+
+
+def minify_css(css: bytes) -> bytes:
+    '''drops comments and the whitespace css does not need, strings are kept as is'''
+    out = []
+    for index, part in enumerate(css_token_pattern.split(css)):
+        if index % 2:
+            if not part.startswith(b'/*'):
+                out.append(part)
+            continue
+        part = space_pattern.sub(b' ', part)
+        out.append(css_punctuation_pattern.sub(rb'\1', part).replace(b';}', b'}'))
+    return b''.join(out).strip()
+
+
+def minify_js(js: bytes) -> bytes:
+    '''strips indentation, trailing spaces and blank lines
+
+    only whitespace around lines is touched, which cannot change a script
+    unless a string spans several lines: files with template literals or
+    line continuations are returned unchanged
+    '''
+    if b'`' in js or re.search(rb'\\\r?\n', js):
+        return js
+    lines = (line.strip() for line in js.splitlines())
+    return b'\n'.join(line for line in lines if line)
+
+
+def png_chunks(data: bytes) -> List[Tuple[bytes, bytes]]:
+    chunks = []
+    position = len(PNG_SIGNATURE)
+    while position < len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        chunks.append((kind, data[position + 8:position + 8 + length]))
+        position += 12 + length
+        if kind == b'IEND':
+            break
+    return chunks
+
+
+def png_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+
+def recompress_png(data: bytes, level: int = 9) -> bytes:
+    '''deflates the image data of a png again at ``level``, as one IDAT chunk
+
+    the pixels and every other chunk are kept as they are
+    '''
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    chunks = png_chunks(data)
+    image = zlib.decompress(b''.join(body for kind, body in chunks if kind == b'IDAT'))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS, 9)
+    idat = png_chunk(b'IDAT', compressor.compress(image) + compressor.flush())
+
+    out = [PNG_SIGNATURE]
+    for kind, body in chunks:
+        if kind == b'IDAT':
+            if idat is not None:
+                out.append(idat)
+                idat = None
+        else:
+            out.append(png_chunk(kind, body))
+    return b''.join(out)
+
+
+def recompress_jpeg(path: str) -> bytes:
+    '''optimizes the huffman tables of a jpeg with ``jpegtran``, if installed'''
+    jpegtran = shutil.which('jpegtran')
+    if jpegtran is None:
+        return None
+    result = subprocess.run([jpegtran, '-copy', 'all', '-optimize', path], capture_output=True, timeout=60)
+    return result.stdout if result.returncode == 0 else None
+
+
+def transform(path: str, data: bytes) -> bytes:
+    '''returns the optimized content of a file'''
+    suffix = Path(path).suffix.lower()
+    if suffix in HTML_SUFFIXES:
+        return minify_html(data)
+    if suffix in CSS_SUFFIXES:
+        return minify_css(data)
+    if suffix in JS_SUFFIXES:
+        return minify_js(data)
+    if suffix == '.png':
+        return recompress_png(data)
+    if suffix in JPEG_SUFFIXES:
+        return recompress_jpeg(path) or data
+    return data
+
+
+def handles(path: str, minify: bool = True, with_sidecars: bool = False) -> bool:
+    '''checks if a file has a transform or a sidecar, other files (e.g videos) are never read'''
+    suffix = Path(path).suffix.lower()
+    return (minify and suffix in TRANSFORM_SUFFIXES) or (with_sidecars and suffix in SIDECAR_SUFFIXES)
+
+
+def sidecar_suffixes() -> Tuple[str, ...]:
+    return SIDECARS if brotli is not None else ('.gz',)
+
+
+def sidecars(data: bytes) -> dict:
+    '''returns the precompressed versions of a file which are smaller than it'''
+    compressed = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['.br'] = brotli.compress(data)
+    return {suffix: body for suffix, body in compressed.items() if len(body) < len(data)}
+
+
+def write(path: str, data: bytes):
+    temp = f'{path}.tmp{os.getpid()}'
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def optimize_file(path: str, cache_dir: str = None, minify: bool = True, with_sidecars: bool = False) -> Tuple[str, int, int]:
+    '''optimizes a file in place, returning its path, old and new size
+
+    with ``cache_dir`` the results are kept by the sha256 of the original
+    content, so a file seen before is copied from the cache
+    '''
+    if not handles(path, minify, with_sidecars):
+        size = os.path.getsize(path)
+        return path, size, size
+    with open(path, 'rb') as f:
+        data = f.read()
+    suffix = Path(path).suffix.lower()
+    wants_sidecars = with_sidecars and suffix in SIDECAR_SUFFIXES and len(data) >= MIN_SIDECAR_SIZE
+
+    cached = None
+    if cache_dir:
+        cached = os.path.join(cache_dir, hashlib.sha256(data).hexdigest() + ('.min' if minify else '') + suffix)
+    if cached and os.path.exists(cached):
+        with open(cached, 'rb') as f:
+            result = f.read()
+        extras = {
+            extension: Path(cached + extension).read_bytes()
+            for extension in SIDECARS if wants_sidecars and os.path.exists(cached + extension)
+        }
+        if wants_sidecars and any(extension not in extras for extension in sidecar_suffixes()):
+            # cached without sidecars, or before brotli was installed
+            extras = sidecars(result)
+            for extension, body in extras.items():
+                write(cached + extension, body)
+    else:
+        result = data
+        if minify:
+            try:
+                result = transform(path, data)
+            except Exception as e:          # a file the transform cannot read is kept as is
+                logger.warning(f'could not optimize {path}: {e}')
+        if len(result) >= len(data):
+            result = data
+        extras = sidecars(result) if wants_sidecars else {}
+        if cached:
+            write(cached, result)
+            for extension, body in extras.items():
+                write(cached + extension, body)
+
+    if result is not data:
+        write(path, result)
+    for extension, body in extras.items():
+        write(path + extension, body)
+    return path, len(data), len(result)
+
+
+class Optimizer:
+    '''Optimizes the saved files of a clone in a process pool
+
+    ...
+
+    ``submit`` every file as it is saved, then ``close`` waits for the pool
+    and returns the number of bytes saved.
+
+    Attributes
+    ----------
+    jobs (int)
+        number of worker processes, all cores by default
+    cache_dir (str)
+        folder of the results cached by content hash, if any
+    minify (bool)
+        minifies and recompresses the files, otherwise they are kept as they are
+    sidecars (bool)
+        also writes ``.gz`` and, with the brotli package, ``.br`` files
+    '''
+
+    def __init__(self, *, jobs: int = None, cache_dir: str = None, minify: bool = True, sidecars: bool = False) -> None:
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else None
+        self.minify = minify
+        self.sidecars = sidecars
+        if self.cache_dir:
+            Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        self.futures = []
+        self._pool = None
+        self._lock = threading.Lock()          # files are submitted from the download threads
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+            return self._pool
+
+    def submit(self, path: str):
+        if path and not path.endswith(SIDECARS) and handles(path, self.minify, self.sidecars):
+            self.futures.append(self.pool.submit(
+                optimize_file, os.path.abspath(path), self.cache_dir, self.minify, self.sidecars
+            ))
+
+    def optimize_tree(self, root_dir: str):
+        '''submits every file under ``root_dir``'''
+        for root, _, files in os.walk(root_dir):
+            for file in files:
+                self.submit(os.path.join(root, file))
+
+    def close(self) -> Tuple[int, int]:
+        '''waits for the submitted files, returning their total size before and after'''
+        before = after = 0
+        for future in self.futures:
+            try:
+                _, old, new = future.result()
+            except Exception as e:
+                logger.error(f'optimizer failed: {e}')
+                continue
+            before += old
+            after += new
+        self.futures = []
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+        return before, after
@@ -0,0 +1,165 @@
+'''downloads large files as parallel http range requests'''
+
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from exceptions import FileAlreadyExists, RangeNotSatisfiedError, ContentTooLargeError
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8 * 1024 ** 2          # bytes per range request
+MIN_SIZE = 16 * 1024 ** 2           # smaller files are downloaded whole
+WORKERS = 4
+RETRIES = 3
+BLOCK_SIZE = 64 * 1024
+
+
+def content_range(session, url: str) -> Tuple[int, bool]:
+    '''returns the size of the file and whether the server accepts range requests'''
+    response = session.head(url, allow_redirects=True, timeout=10)
+    if response.status_code != 200:
+        return 0, False
+    size = int(response.headers.get('Content-Length') or 0)
+    accepts = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    return size, accepts
+
+
+def split(size: int, chunk_size: int) -> List[Tuple[int, int]]:
+    '''returns the inclusive (start, end) byte ranges covering ``size`` bytes'''
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+class RangedDownload:
+    '''A resumable download of one large file
+
+    ...
+
+    The file is written in place to ``<path>.part`` and the finished chunks
+    are kept in ``<path>.part.json``, so a download interrupted by a dropped
+    connection (or a killed process) only fetches the missing ranges on the
+    next attempt. Inside a chunk, a dropped connection resumes from the last
+    byte written.
+
+    Attributes
+    ----------
+    url (str)
+        the url of the file
+    path (str)
+        where the file is saved once complete
+    size (int)
+        the size of the file in bytes
+    '''
+
+    def __init__(self, url: str, path: str, size: int, session, *, chunk_size: int = CHUNK_SIZE, bandwidth=None) -> None:
+        self.url = url
+        self.path = path
+        self.size = size
+        self.session = session
+        self.chunk_size = chunk_size
+        self.bandwidth = bandwidth
+        self.part = path + '.part'
+        self.state = path + '.part.json'
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load_state(self):
+        if not (Path(self.part).exists() and Path(self.state).exists()):
+            return
+        with open(self.state) as f:
+            state = json.load(f)
+        if state.get('size') == self.size and state.get('chunk_size') == self.chunk_size:
+            self.done = set(state['done'])
+
+    def save_state(self):
+        with open(self.state, 'w') as f:
+            json.dump({'size': self.size, 'chunk_size': self.chunk_size, 'done': sorted(self.done)}, f)
+
+    def fetch_chunk(self, index: int, start: int, end: int):
+        position = start
+        for attempt in range(RETRIES):
+            try:
+                response = self.session.get(
+                    self.url,
+                    headers={'Range': f'bytes={position}-{end}'},
+                    stream=True,
+                    timeout=30
+                )
+                if response.status_code != 206:
+                    raise RangeNotSatisfiedError(f'{self.url} returned {response.status_code} for a range request')
+                with open(self.part, 'r+b') as f:
+                    f.seek(position)
+                    for block in response.iter_content(BLOCK_SIZE):
+                        if self.bandwidth is not None:
+                            self.bandwidth.consume(len(block))
+                        f.write(block)
+                        position += len(block)
+                if position > end:
+                    break
+            except RangeNotSatisfiedError:
+                raise
+            except Exception:
+                logger.warning(f'range {position}-{end} of {self.url} dropped, resuming')
+                if attempt == RETRIES - 1:
+                    raise
+        else:
+            raise RangeNotSatisfiedError(f'{self.url}: range {start}-{end} is incomplete')
+
+        with self._lock:
+            self.done.add(index)
+            self.save_state()
+
+    def run(self, workers: int = WORKERS) -> str:
+        if Path(self.path).exists():
+            raise FileAlreadyExists(f'{self.path} already exists')
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.load_state()
+        if not self.done:
+            with open(self.part, 'wb') as f:
+                f.truncate(self.size)
+
+        chunks = [
+            (index, start, end)
+            for index, (start, end) in enumerate(split(self.size, self.chunk_size))
+            if index not in self.done
+        ]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.fetch_chunk, *chunk) for chunk in chunks]
+            for future in futures:
+                future.result()     # raises the first failed chunk, state is kept for resuming
+
+        os.replace(self.part, self.path)
+        os.remove(self.state)
+        return self.path
+
+
+def download_ranged(
+        url: str,
+        path: str,
+        session,
+        *,
+        min_size: int = MIN_SIZE,
+        max_size: int = None,
+        chunk_size: int = CHUNK_SIZE,
+        workers: int = WORKERS,
+        bandwidth=None
+    ) -> bool:
+    '''downloads ``url`` to ``path`` in parallel range requests
+
+    returns False, without downloading anything, if the file is smaller than
+    ``min_size`` or the server does not support range requests so the caller
+    can fall back to a plain download. The range requests are not
+    recorded to a WARC
+    '''
+    size, accepts = content_range(session, url)
+    if max_size is not None and size > max_size:
+        raise ContentTooLargeError(f'{url} is {size} bytes, the limit is {max_size}')
+    if not accepts or size < min_size:
+        return False
+    RangedDownload(url, path, size, session, chunk_size=chunk_size, bandwidth=bandwidth).run(workers=workers)
+    return True
@@ -0,0 +1,126 @@
+'''compiled rules deciding which links of a page are crawled'''
+
+import os
+import re
+from typing import Iterable, Optional
+
+from utils import is_file_path
+
+# hrefs that never point to a page or file of the site
+EXCLUDED_LINKS = frozenset(['', '/', '#'])
+EXCLUDED_PREFIXES = ('//', 'tel:', 'mailto:')
+EXCLUDED_PATTERN = re.compile(r'javascript:void|data:image|;base64')
+
+
+def combine(patterns: Iterable[str]) -> Optional[re.Pattern]:
+    '''compiles a list of regular expressions into a single alternation'''
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+
+def resolve(link: str, page_url: str, base_url: str) -> str:
+    '''returns the url an internal href of ``page_url`` points to
+
+    joined the way ``models.Link`` joins it, from strings only so no
+    ``Link`` is created for the hrefs the rules skip
+    '''
+    if link.startswith('http'):
+        return link
+    if link.startswith('/'):
+        return base_url.rstrip('/') + link
+    page_url = page_url or base_url
+    if link.startswith('?'):
+        return page_url.rstrip('/') + '/' + link
+    directory = page_url.rsplit('/', 1)[0] if is_file_path(page_url) else page_url.rstrip('/')
+    return os.path.normpath(f'{directory}/{link}').replace(':/', '://')
+
+
+class PrefixTrie:
+    '''A character trie checking a string against many prefixes at once
+
+    the cost of ``match`` depends on the length of the matched prefix,
+    not on the number of prefixes
+    '''
+
+    __slots__ = ('root',)
+    END = None
+
+    def __init__(self, prefixes: Iterable[str] = ()) -> None:
+        self.root = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def __bool__(self):
+        return bool(self.root)
+
+    def add(self, prefix: str):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self.END] = True
+
+    def match(self, s: str) -> bool:
+        '''returns True if ``s`` starts with any of the prefixes'''
+        node = self.root
+        if self.END in node:
+            return True
+        for char in s:
+            node = node.get(char)
+            if node is None:
+                return False
+            if self.END in node:
+                return True
+        return False
+
+
+class LinkRules:
+    '''User rules applied to page links before they are turned into ``Link``s
+
+    ...
+
+    Attributes
+    ----------
+    include (list)
+        regular expressions, when given a link must match one of them
+    exclude (list)
+        regular expressions, links matching any of them are skipped
+    exclude_paths (list)
+        path prefixes (e.g ``/calendar``) which are never crawled
+    max_depth (int)
+        number of hops from the homepage after which links are not followed
+    '''
+
+    def __init__(
+            self,
+            *,
+            include: Iterable[str] = (),
+            exclude: Iterable[str] = (),
+            exclude_paths: Iterable[str] = (),
+            max_depth: int = None
+        ) -> None:
+        self.include = combine(include)
+        self.exclude = combine(exclude)
+        self.exclude_paths = PrefixTrie('/' + path.lstrip('/') for path in exclude_paths)
+        self.max_depth = max_depth
+
+    def allows_depth(self, depth: int) -> bool:
+        return self.max_depth is None or depth <= self.max_depth
+
+    def allows(self, link: str, base_url: str, page_url: str = None) -> bool:
+        '''checks an internal href of ``page_url`` against the include and exclude rules
+
+        the rules see the url the href resolves to, so ``?month=4`` on
+        ``/calendar/`` is under ``/calendar``
+        '''
+        url = resolve(link, page_url, base_url)
+        if self.exclude_paths:
+            path = url[len(base_url):] if base_url and url.startswith(base_url) else url
+            if self.exclude_paths.match('/' + path.lstrip('/')):
+                return False
+        if self.exclude is not None and self.exclude.search(url):
+            return False
+        if self.include is not None and not self.include.search(url):
+            return False
+        return True
@@ -0,0 +1,246 @@
+'''orders the downloads of a clone so a partial export is as usable as possible'''
+
+import json
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, Tuple
+
+# download tiers, a lower tier always goes first
+CRITICAL = 0        # pages and the stylesheets and scripts they need to render
+IMAGE = 1
+MEDIA = 2
+
+PAGE_RANK = 0
+CSS_RANK = 1
+JS_RANK = 2
+
+CSS_SUFFIXES = frozenset(['.css'])
+JS_SUFFIXES = frozenset(['.js', '.mjs'])
+IMAGE_SUFFIXES = frozenset(['.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif', '.ico', '.bmp'])
+MEDIA_SUFFIXES = frozenset([
+    '.mp4', '.webm', '.mov', '.m4v', '.mp3', '.ogg', '.oga', '.wav', '.m4a', '.vtt',
+])
+# assumed size of a file whose size is unknown
+DEFAULT_SIZES = {CSS_RANK: 32 * 1024, JS_RANK: 128 * 1024, IMAGE: 256 * 1024, MEDIA: 16 * 1024 ** 2}
+
+
+def suffix(url: str) -> str:
+    return Path(urlsplit(str(url)).path).suffix.lower()
+
+
+def classify(url: str) -> Tuple[int, int]:
+    '''returns the tier and rank of an asset from its extension'''
+    extension = suffix(url)
+    if extension in CSS_SUFFIXES:
+        return CRITICAL, CSS_RANK
+    if extension in JS_SUFFIXES:
+        return CRITICAL, JS_RANK
+    if extension in MEDIA_SUFFIXES:
+        return MEDIA, 0
+    return IMAGE, 0         # images, fonts and anything unknown
+
+
+class SizeCache:
+    '''The last known size of every downloaded url
+
+    ...
+
+    Filled from the ``Content-Length`` of HEAD requests and the bodies of
+    past downloads, and kept in a json file between runs so a clone starts
+    with the sizes of the files it saw before.
+
+    Attributes
+    ----------
+    sizes (dict)
+        the size in bytes of every url
+    path (str)
+        json file the sizes are loaded from and saved to, if any
+    '''
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self.sizes: Dict[str, int] = {}
+        if path and Path(path).exists():
+            with open(path) as f:
+                self.sizes = json.load(f)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def get(self, url: str) -> int:
+        return self.sizes.get(str(url))
+
+    def record(self, url: str, size: int):
+        if size is not None:
+            self.sizes[str(url)] = int(size)
+
+    def probe(self, urls: Iterable[str], session, *, workers: int = 8):
+        '''HEADs the urls whose size is unknown, recording their ``Content-Length``'''
+        def head(url):
+            try:
+                response = session.head(url, allow_redirects=True, timeout=10)
+            except Exception:
+                return
+            length = response.headers.get('Content-Length')
+            if response.status_code == 200 and length and length.isdigit():
+                self.record(url, int(length))
+
+        urls = [str(url) for url in urls if self.get(url) is None]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(head, urls))
+
+    def save(self):
+        if self.path:
+            with open(self.path, 'w') as f:
+                json.dump(self.sizes, f)
+
+
+class AssetScheduler:
+    '''A priority queue of the pages and assets of a clone
+
+    ...
+
+    Pages and the stylesheets and scripts they use come first, in the
+    order the pages were found, so each written page is followed by what
+    it needs to render. Images follow, by page then size, and media last,
+    smallest first.
+
+    Attributes
+    ----------
+    sizes (SizeCache)
+        the known sizes of the assets
+    '''
+
+    def __init__(self, sizes: SizeCache = None) -> None:
+        self.sizes = sizes if sizes is not None else SizeCache()
+        self._heap = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def size_of(self, url: str, rank: int) -> int:
+        size = self.sizes.get(url)
+        return size if size is not None else DEFAULT_SIZES.get(rank, DEFAULT_SIZES[IMAGE])
+
+    def priority(self, url: str, page_order: int = 0) -> tuple:
+        '''returns the sort key of an asset first found on the ``page_order``-th page'''
+        tier, rank = classify(url)
+        if tier == CRITICAL:
+            return (CRITICAL, page_order, rank, self.size_of(url, rank))
+        size = self.size_of(url, tier)
+        if tier == MEDIA:
+            return (MEDIA, size, page_order)
+        return (tier, page_order, size)
+
+    @staticmethod
+    def page_priority(page_order: int) -> tuple:
+        return (CRITICAL, page_order, PAGE_RANK, 0)
+
+    def push(self, item: Any, priority: tuple):
+        heapq.heappush(self._heap, (priority, next(self._order), item))
+
+    def push_asset(self, asset, page_order: int = 0):
+        self.push(asset, self.priority(str(asset), page_order))
+
+    def push_page(self, page, page_order: int):
+        self.push(page, self.page_priority(page_order))
+
+    def pop(self) -> Any:
+        return heapq.heappop(self._heap)[2]
+
+    def __iter__(self):
+        while self._heap:
+            yield self.pop()
+
+
+class TokenBucket:
+    '''Caps the bandwidth shared by every download
+
+    ``consume`` blocks until ``size`` bytes fit in the rate, bursts of up to
+    ``burst`` bytes pass at once. Safe to use from several threads.
+
+    Attributes
+    ----------
+    rate (float)
+        bytes per second
+    burst (float)
+        size of the bucket in bytes
+    '''
+
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def consume(self, size: int):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= size            # a debt is paid by the caller sleeping
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class PrioritySemaphore:
+    '''An asyncio semaphore handing its free slots to the lowest priority waiting'''
+
+    def __init__(self, value: int) -> None:
+        self._value = value
+        self._waiters = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: tuple = ()):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()          # the slot was handed over as the task was cancelled
+            else:
+                self._waiters = [waiter for waiter in self._waiters if waiter[2] is not future]
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    @asynccontextmanager
+    async def slot(self, priority: tuple = ()):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
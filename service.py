@@ -0,0 +1,269 @@
+'''runs clones as a long lived local http service fed by a job queue
+
+POST /jobs                  {"url": ..., "priority": 0, "options": {...}}
+GET  /jobs                  every job
+GET  /jobs/<id>             the status of a job
+GET  /jobs/<id>/artifact    the archive of a finished job
+
+``options`` are the command line options of ``main.py`` by their
+argument names, e.g ``{"include_media": true, "max_depth": 2}``
+'''
+
+import os
+import json
+import time
+import uuid
+import queue
+import logging
+import itertools
+import threading
+import socketserver
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from main import main as clone, build_params, OPTIONS
+from sites import STATS, CONCURRENCY
+from exceptions import InvalidInputError
+from utils import validate_url
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+# options naming a file, kept inside the folder of the job
+PATH_OPTIONS = ('warc_dir', 'failure_cache', 'manifest', 'frontier_db', 'size_cache', 'optimize_cache')
+
+
+class Job:
+    '''A clone requested from the service'''
+
+    def __init__(self, url: str, options: dict, priority: int = 0) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.options = options
+        self.priority = priority
+        self.status = QUEUED
+        self.error = None
+        self.artifact = None
+        self.stats = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'url': self.url,
+            'priority': self.priority,
+            'status': self.status,
+            'error': self.error,
+            'artifact': f'/jobs/{self.id}/artifact' if self.artifact else None,
+            'stats': self.stats,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class CloneService:
+    '''Runs the submitted jobs one at a time, lowest ``priority`` first
+
+    ...
+
+    Every job gets a session of its own, so cookies and credentials never
+    leak from one client's job to another, but the sessions share one
+    connection pool: connections (and their TLS sessions) to a site stay
+    open from one job to the next. Jobs run one at a time since a clone
+    works in the process' current directory, see ``main.main``.
+
+    The process keeps the interpreter and the crawler modules loaded
+    between jobs. There is no http cache, every job fetches its urls again,
+    and pages are parsed in the threads of each job.
+
+    Attributes
+    ----------
+    directory (str)
+        the folder of the jobs, each job works and leaves its archive in ``<directory>/<id>``
+    jobs (dict)
+        every job by id
+    adapter (HTTPAdapter)
+        the connection pool shared by the sessions of the jobs
+    '''
+
+    def __init__(self, directory: str, *, adapter: HTTPAdapter = None) -> None:
+        self.directory = os.path.abspath(directory)
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+        self.jobs = {}
+        self.queue = queue.PriorityQueue()
+        self.adapter = adapter if adapter is not None else HTTPAdapter(pool_connections=32, pool_maxsize=CONCURRENCY * 2)
+        self._order = itertools.count()         # first in, first out among equal priorities
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def make_session(self) -> requests.Session:
+        '''returns a new session using the shared connection pool'''
+        session = requests.session()
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    def submit(self, url: str, options: dict = None, priority: int = 0) -> Job:
+        '''queues a clone of ``url``, raising ``InvalidInputError`` for bad input'''
+        options = dict(options or {})
+        if not isinstance(url, str) or not validate_url(url):
+            raise InvalidInputError(f'not a valid url: {url!r}')
+        if not isinstance(priority, int):
+            raise InvalidInputError('priority must be an integer')
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            raise InvalidInputError(f'unknown options: {", ".join(sorted(unknown))}')
+        for key in PATH_OPTIONS:
+            path = options.get(key)
+            if path is not None and (os.path.isabs(path) or '..' in Path(path).parts):
+                raise InvalidInputError(f'{key} must be a path inside the job folder')
+        build_params(options)                   # fails early on invalid combinations
+
+        job = Job(url, options, priority)
+        with self._lock:
+            self.jobs[job.id] = job
+        self.queue.put((priority, next(self._order), job))
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def run(self, job: Job):
+        job.status = RUNNING
+        job.started = time.time()
+        base_dir = os.path.join(self.directory, job.id)
+        Path(base_dir).mkdir(parents=True, exist_ok=True)
+        params = build_params(job.options)
+        params['session'] = self.make_session()
+        cwd = os.getcwd()
+        try:
+            job.artifact = clone(job.url, base_dir=base_dir, **params)
+            job.status = DONE
+        except Exception as e:
+            logger.exception(f'job {job.id} failed', exc_info=e)
+            job.error = str(e) or e.__class__.__name__
+            job.status = FAILED
+        finally:
+            os.chdir(cwd)
+            job.stats = dict(STATS)
+            job.finished = time.time()
+
+    def work(self):
+        '''runs the queued jobs until ``stop`` is called'''
+        while True:
+            _, _, job = self.queue.get()
+            if job is None:
+                break
+            self.run(job)
+
+    def start(self):
+        self._worker = threading.Thread(target=self.work, name='clone-worker', daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout: float = None):
+        '''stops once the running job is done, queued jobs are dropped'''
+        self.queue.put((float('-inf'), -1, None))
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    '''The http api of a ``CloneService``, found on ``server.service``'''
+
+    def address_string(self):
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def send_json(self, status: int, data):
+        body = json.dumps(data).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            return self.send_json(404, {'error': 'not found'})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            data = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(data, dict):
+                raise InvalidInputError('expected a json object')
+            job = self.server.service.submit(data.get('url'), data.get('options'), data.get('priority', 0))
+        except (ValueError, InvalidInputError) as e:
+            return self.send_json(400, {'error': str(e)})
+        self.send_json(201, job.to_dict())
+
+    def do_GET(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if parts == ['jobs']:
+            return self.send_json(200, [job.to_dict() for job in self.server.service.list()])
+        if len(parts) not in (2, 3) or parts[0] != 'jobs':
+            return self.send_json(404, {'error': 'not found'})
+        job = self.server.service.get(parts[1])
+        if job is None:
+            return self.send_json(404, {'error': 'no such job'})
+        if len(parts) == 2:
+            return self.send_json(200, job.to_dict())
+        if parts[2] != 'artifact':
+            return self.send_json(404, {'error': 'not found'})
+        if job.status != DONE:
+            return self.send_json(409, {'error': f'job is {job.status}'})
+        self.send_file(job.artifact)
+
+    def send_file(self, filename: str):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(filename)))
+        self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(filename)}"')
+        self.end_headers()
+        with open(filename, 'rb') as f:
+            while block := f.read(64 * 1024):
+                self.wfile.write(block)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: CloneService, host: str = '127.0.0.1', port: int = 8765, socket_path: str = None):
+    '''returns the http server of ``service``, on a unix socket if ``socket_path`` is given'''
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, ServiceHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.service = service
+    return server
+
+
+def serve(directory: str, host: str = '127.0.0.1', port: int = 8765, socket_path: str = None):
+    '''runs the clone service until interrupted'''
+    service = CloneService(directory)
+    service.start()
+    server = make_server(service, host, port, socket_path)
+    print(f'Serving clone jobs on {socket_path or f"http://{host}:{port}"}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,116 @@
+'''seeds the crawl frontier from robots.txt and sitemap.xml files'''
+
+import io
+import gzip
+import logging
+from collections import deque
+from typing import Iterator, List, Tuple
+from urllib.parse import urljoin
+from xml.etree.ElementTree import iterparse, ParseError
+
+logger = logging.getLogger(__name__)
+
+MAX_SITEMAPS = 50
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sitemap_tag(name: str) -> str:
+    '''the name of a tag of the sitemaps.org namespace'''
+    return f'{{{SITEMAP_NAMESPACE}}}{name}'
+
+
+# sitemaps without a namespace are read too, the tags of extensions
+# (e.g ``image:loc``) always have their own
+LOC_TAGS = frozenset([sitemap_tag('loc'), 'loc'])
+ENTRY_TAGS = frozenset([sitemap_tag('url'), sitemap_tag('sitemap'), 'url', 'sitemap'])
+INDEX_TAGS = frozenset([sitemap_tag('sitemapindex'), 'sitemapindex'])
+
+
+def robots_sitemaps(base_url: str, session) -> List[str]:
+    '''returns the sitemap urls listed in the site's robots.txt'''
+    url = urljoin(base_url.rstrip('/') + '/', 'robots.txt')
+    response = session.get(url, stream=True, timeout=10)
+    if response.status_code != 200:
+        return []
+
+    sitemaps = []
+    for line in response.iter_lines():
+        if isinstance(line, bytes):
+            line = line.decode('utf8', 'ignore')
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(urljoin(url, value.strip()))
+    return sitemaps
+
+
+def open_stream(response) -> io.BufferedReader:
+    '''returns the response body as a file, gunzipping ``.xml.gz`` sitemaps'''
+    raw = response.raw
+    if hasattr(raw, 'decode_content'):
+        raw.decode_content = True       # undo any Content-Encoding
+    stream = io.BufferedReader(raw) if not isinstance(raw, io.BufferedReader) else raw
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def parse_sitemap(stream) -> Iterator[Tuple[str, bool]]:
+    '''incrementally parses a sitemap
+
+    yields ``(loc, is_index)`` where ``is_index`` is True for the
+    nested sitemaps of a sitemap index. Only the ``loc`` of a ``url`` or
+    ``sitemap`` entry is read, not the ``loc`` of extensions like images
+    '''
+    is_index = False
+    parents = []
+    for event, element in iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element.tag)
+            if element.tag in INDEX_TAGS:
+                is_index = True
+            continue
+        parents.pop()
+        if element.tag in LOC_TAGS and parents and parents[-1] in ENTRY_TAGS and element.text:
+            yield element.text.strip(), is_index
+        elif element.tag in ENTRY_TAGS:
+            element.clear()     # keep memory flat on very large sitemaps
+
+
+def iter_sitemap_urls(base_url: str, session, *, max_sitemaps: int = MAX_SITEMAPS) -> Iterator[str]:
+    '''yields every page url found in the site's sitemaps
+
+    sitemaps are read from robots.txt, falling back to ``/sitemap.xml``,
+    and sitemap indexes are followed up to ``max_sitemaps`` files
+    '''
+    try:
+        sitemaps = robots_sitemaps(base_url, session)
+    except Exception:
+        logger.exception('robots.txt could not be read')
+        sitemaps = []
+    if not sitemaps:
+        sitemaps = [urljoin(base_url.rstrip('/') + '/', 'sitemap.xml')]
+
+    queue = deque(sitemaps)
+    seen = set()
+    while queue and len(seen) < max_sitemaps:
+        url = queue.popleft()
+        if url in seen:
+            continue
+        seen.add(url)
+
+        try:
+            response = session.get(url, stream=True, timeout=10)
+            if response.status_code != 200:
+                continue
+            for loc, is_index in parse_sitemap(open_stream(response)):
+                if is_index:
+                    queue.append(loc)
+                else:
+                    yield loc
+        except (ParseError, OSError, EOFError):
+            logger.exception(f'sitemap could not be parsed: {url}')
+        except Exception:
+            logger.exception(f'sitemap download failed: {url}')
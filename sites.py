@@ -1,45 +1,129 @@
 #! /usr/bin/env python3
 
 import os
+import asyncio
+import inspect
 import logging
 import requests
 from pathlib import Path
 from collections import deque
-from typing import List, Mapping
+from typing import Callable, Dict, List, Mapping
 
 from url_parser import get_url
 
-from generator import Parser
-from models import Link, find_urls
-from exceptions import PageNotFoundError, FileAlreadyExists, AuthenticationError
+from generator import Parser, parse_image_policy
+from models import Link, PathIndex, find_urls
+from exceptions import PageNotFoundError, FileAlreadyExists, AuthenticationError, NotHTMLError, InvalidInputError
 from utils import save_file, make_relative, validate_url, make_byte
+from warc import WARCWriter
+from sitemaps import iter_sitemap_urls
+from rules import LinkRules
+from failures import FailureCache
+from ranged import download_ranged
+from limits import SizeLimits, content_type, is_html, read_body
+from streaming import LinkExtractor, PAGE, IMAGE, MEDIA
+from dedupe import URLCanonicalizer, SimHashIndex, simhash, redirect_page
+from scheduler import AssetScheduler, PrioritySemaphore, SizeCache, TokenBucket
+from optimize import Optimizer
 
-logging.basicConfig(filename='process.log', level=logging.ERROR, filemode='w')
 logger = logging.getLogger(__name__)
 
 EXPORT_PATH = Path('export')
 MAX_PAGES = 50
+CONCURRENCY = 8
 STATS = {
     'pages': 0,
     'assets': 0,
-    'errors': 0
+    'errors': 0,
+    'duplicates': 0
 }
 
 class Page:
-    def __init__(self, url: Link, session, *, base_url, **kwargs):
-        '''A webpage model'''
+    def __init__(
+            self,
+            url: Link,
+            session,
+            *,
+            base_url,
+            warc=None,
+            content: bytes = None,
+            rules: LinkRules = None,
+            image_policy: str = 'all',
+            limits: SizeLimits = None,
+            index: PathIndex = None,
+            bandwidth: TokenBucket = None,
+            **kwargs
+        ):
+        '''A webpage model
+
+        the page is downloaded on creation unless its ``content`` is given,
+        ``NotHTMLError`` is raised if the url turns out not to be a page
+        '''
         self.url = str(url)
         self.link = url
         self.base_url = base_url
         self.session = session
-        self._content = self.get(self.url, session=session)
-        self.parser = Parser(html=self._content, page_url=self.url, base_url=self.base_url)
+        self.index = index if index is not None else PathIndex()
+        if content is None:
+            content = self.get(self.url, session=session, warc=warc, limits=limits, html_only=True, bandwidth=bandwidth)
+        self._content = content
+        self.parser = Parser(
+            html=self._content,
+            page_url=self.url,
+            base_url=self.base_url,
+            rules=rules,
+            depth=getattr(url, 'depth', 0),
+            image_policy=image_policy
+        )
         self.transforms = {}
     
     @staticmethod
-    def get(url: str, session=None):
-        '''downloads the asset pointed to by the link'''
-        response = session.get(url, allow_redirects=True, timeout=10)
+    def get(
+            url: str,
+            session=None,
+            warc=None,
+            limits: SizeLimits = None,
+            html_only: bool = False,
+            on_discover: Callable[[str, List[str]], None] = None,
+            bandwidth: TokenBucket = None
+        ):
+        '''downloads the asset pointed to by the link
+
+        the headers are checked before the body is read: with ``html_only``
+        a response which is not html raises ``NotHTMLError`` holding the
+        unread response, and bodies over ``limits`` are aborted.
+        ``on_discover`` is given the urls of the page while it downloads,
+        see ``streaming.LinkExtractor``, and ``bandwidth`` caps the download rate
+        '''
+        response = session.get(url, allow_redirects=True, timeout=10, stream=True)
+        if html_only and response.status_code == 200:
+            mime_type = content_type(response.headers)
+            if not is_html(mime_type):
+                raise NotHTMLError(f'{url} is {mime_type}', content_type=mime_type, response=response)
+
+        extractor = on_chunk = None
+        if on_discover is not None and response.status_code == 200:
+            extractor = LinkExtractor(on_discover, encoding=response.encoding or 'utf-8')
+            on_chunk = extractor.feed_bytes
+        content = Page.receive(url, response, warc=warc, limits=limits, on_chunk=on_chunk, bandwidth=bandwidth)
+        if extractor is not None:
+            extractor.close()           # reports the tags still buffered at the end of the body
+        return content
+
+    @staticmethod
+    def receive(url: str, response, warc=None, limits: SizeLimits = None, on_chunk=None, bandwidth=None) -> bytes:
+        '''reads the body of a response returned by ``get``
+
+        every exchange, failed ones included, is recorded to ``warc`` if given
+        '''
+        read_body(url, response, limits, on_chunk=on_chunk, bandwidth=bandwidth)
+        if warc is not None:
+            warc.write_response(response)
+        return Page.check(url, response)
+
+    @staticmethod
+    def check(url: str, response) -> bytes:
+        '''returns the response body, raising for error status codes'''
         if response.status_code == 404:
             raise PageNotFoundError(f'Page does not exist: {url}')
         elif response.status_code == 403:
@@ -47,6 +131,67 @@ class Page:
 
         return response.content
 
+    @staticmethod
+    async def aget(
+            url: str,
+            client,
+            warc=None,
+            limits: SizeLimits = None,
+            html_only: bool = False,
+            on_discover=None,
+            bandwidth: TokenBucket = None
+        ) -> bytes:
+        '''asynchronous version of ``get``
+
+        ``client`` is either an async http client whose ``get`` is a coroutine
+        (e.g ``httpx.AsyncClient``) or a ``requests`` session, in which case
+        the request runs in the event loop's default executor.
+        An async client cannot record to ``warc``, its body is not streamed
+        to ``on_discover`` and it follows redirects only if configured to
+        (e.g ``httpx.AsyncClient(follow_redirects=True)``)
+        '''
+        if inspect.iscoroutinefunction(client.get):
+            if warc is not None:
+                raise InvalidInputError('WARC recording needs a requests session, not an async client')
+            response = await client.get(url)
+            mime_type = content_type(response.headers)
+            if html_only and response.status_code == 200 and not is_html(mime_type):
+                raise NotHTMLError(f'{url} is {mime_type}', content_type=mime_type, response=response)
+            read_body(url, response, limits, bandwidth=bandwidth)
+            return Page.check(url, response)
+        return await asyncio.to_thread(
+            Page.get, url, session=client, warc=warc, limits=limits, html_only=html_only,
+            on_discover=on_discover, bandwidth=bandwidth
+        )
+
+    @classmethod
+    async def fetch(
+            cls,
+            link: Link,
+            client,
+            *,
+            base_url,
+            warc=None,
+            limits: SizeLimits = None,
+            on_discover=None,
+            bandwidth: TokenBucket = None,
+            **kwargs
+        ):
+        '''downloads and parses a page without blocking the event loop
+
+        ``on_discover`` is only called for ``requests`` sessions, whose
+        responses are streamed
+        '''
+        content = await cls.aget(
+            str(link), client, warc=warc, limits=limits, html_only=True, on_discover=on_discover, bandwidth=bandwidth
+        )
+        return await asyncio.to_thread(cls, link, client, base_url=base_url, content=content, **kwargs)
+
+    @property
+    def text(self) -> str:
+        '''the text of the page, near duplicates are detected on it'''
+        return self.parser.page.get_text(' ')
+
     def get_images(self):
         return self.parser.get_images()
 
@@ -61,7 +206,7 @@ class Page:
 
     def download(self):
         try:
-            path = self.link.relative
+            path = self.index.path_for(self.link)
             filename = save_file(path, self.content)
         except FileAlreadyExists:
             return False
@@ -75,10 +220,10 @@ class Page:
         '''make all the page links relative'''
     
         links = [*self.get_links(), *self.get_cssjs(), *self.get_images(), *self.get_media()]
-        rcontent = self._content[:]
+        rcontent = make_relative(self._content[:], self.parser.transforms)
         print(type(rcontent))
         for link in links:
-            rcontent = rcontent.replace(make_byte(link.link), make_byte(link.relative))
+            rcontent = rcontent.replace(make_byte(link.link), make_byte(self.index.path_for(link)))
         return rcontent
 
 
@@ -97,6 +242,21 @@ class Site:
         The list of static assets from the site
     site_pages(list)
         A queue of all the site pages to avoid visiting twice
+    canonicalize (URLCanonicalizer)
+        the urls of the same page (e.g with tracking parameters) are only fetched once
+    fingerprints (SimHashIndex)
+        with ``near_duplicates``, the fingerprints of the pages kept. A page
+        within ``near_duplicates`` bits of one of them is dropped before
+        its links are followed
+    session (requests.Session)
+        the http session, which may be shared by several clones to reuse its connections
+    sizes (SizeCache)
+        the known sizes of the assets, smaller files are downloaded first.
+        With ``probe_sizes`` unknown sizes are asked for with a HEAD request
+    bandwidth (TokenBucket)
+        caps the download rate of the whole clone
+    optimizer (Optimizer)
+        if given, every saved file is minified or recompressed by it
     '''
 
     def __init__(
@@ -108,21 +268,55 @@ class Site:
             images_only: bool = False,
             include_media: bool = False,
             single_page: bool = False,
+            warc: WARCWriter = None,
+            use_sitemaps: bool = False,
+            rules: LinkRules = None,
+            failures: FailureCache = None,
+            image_policy: str = 'all',
+            limits: SizeLimits = None,
+            streaming: bool = False,
+            index: PathIndex = None,
+            canonicalize: URLCanonicalizer = None,
+            near_duplicates: int = None,
+            session=None,
+            sizes: SizeCache = None,
+            probe_sizes: bool = False,
+            bandwidth: TokenBucket = None,
+            optimizer: Optimizer = None,
             *args,
             **kwargs
         ) -> None:
         '''initializes an instance with a base_url'''
         self.base_url = base_url
-        self.session = requests.session()
+        self.session = session if session is not None else requests.session()
         self.images_only = images_only
         self.include_media = include_media
         self.single_page = single_page
+        self.warc = warc
+        self.use_sitemaps = use_sitemaps
+        self.rules = rules
+        self.failures = failures if failures is not None else FailureCache()
+        self.image_policy = image_policy
+        parse_image_policy(image_policy)
+        self.limits = limits if limits is not None else SizeLimits()
+        self.streaming = streaming
+        self.canonicalize = canonicalize if canonicalize is not None else URLCanonicalizer()
+        self.index = index if index is not None else PathIndex(canonicalize=self.canonicalize)
+        self.fingerprints = SimHashIndex(near_duplicates) if near_duplicates is not None else None
+        self.sizes = sizes if sizes is not None else SizeCache()
+        self.probe_sizes = probe_sizes
+        self.bandwidth = bandwidth
+        self.optimizer = optimizer
         if user:
             self.session.auth = (user, password)
         self.sitename = get_url(self.base_url).domain
 
         self.pages: Mapping[str: Page] = {}             # A mapping of already processed links to actual page content
         self.visited_paths: List[str] = []              # A list of already visited links
+        self.seen = set()                               # canonical urls of the fetched pages
+        self.duplicates: Dict[str, str] = {}            # near duplicate pages and the page kept instead
+        self.page_order: Dict[str, int] = {}            # the order pages were found in
+        self.asset_pages: Dict[str, int] = {}           # the order of the first page using each asset
         self.site_links: List[Link] = deque()           # List of site links in a queue
 
         self.images = set()                             # All the images to download in a set
@@ -130,26 +324,182 @@ class Site:
         self.media = set()                              # Media links to download in a set
         self.extra_links = set()                        # Links parsed from other assets
         self.visited_links: List[str] = []              # A list of downloaded assets
+        self.visited_assets = set()                     # the same urls, for lookups
+
 
+    @property
+    def page_options(self) -> dict:
+        '''the keyword arguments every ``Page`` of the site is created with'''
+        return {
+            'base_url': self.base_url,
+            'warc': self.warc,
+            'rules': self.rules,
+            'image_policy': self.image_policy,
+            'limits': self.limits,
+            'index': self.index,
+            'bandwidth': self.bandwidth,
+        }
 
     @property
     def assets(self) -> List[Link]:
-        return {*self.images, *self.cssjs, *self.media}
+        return {*self.images, *self.cssjs, *(self.media if self.include_media else ())}
 
     def clone(self):
         '''clones the webpage from the specified url'''
-        page = Page(self.base_url, session=self.session, base_url=self.base_url)
-        if self.single_page:
-            return self.download_page(page=page, session=self.session, images=self.images_only, media=self.include_media)
+        return asyncio.run(self.aclone())
 
-        self.browse(self.base_url)
+    async def aclone(self, client=None, *, concurrency: int = CONCURRENCY):
+        '''clones the website without blocking the event loop
 
-        if self.images_only:
-            self.download(assets=self.images, session=self.session)
-        else:
-            self.download(assets=self.assets, pages=self.pages.values(), session=self.session)
+        ``client`` defaults to the site session, see ``Page.aget``
+        '''
+        async for _ in self.iter_clone(client, concurrency=concurrency):
+            pass
+
+    async def iter_clone(self, client=None, *, concurrency: int = CONCURRENCY):
+        '''clones the website, yielding every page and asset as soon as it is saved
+
+        pages are fetched ``concurrency`` at a time and the assets of a page
+        are queued as soon as it is parsed rather than after browsing ends.
+        With ``streaming`` they are queued while the page is still downloading.
+        Free slots go to the pages and their stylesheets and scripts first,
+        see ``scheduler.AssetScheduler``. With ``images_only`` the pages are
+        browsed but not written. See ``Page.aget`` for what an async ``client``
+        does not support
+        '''
+        client = client or self.session
+        if self.warc is not None and inspect.iscoroutinefunction(client.get):
+            raise InvalidInputError('WARC recording needs a requests session, not an async client')
+        loop = asyncio.get_running_loop()
+        semaphore = PrioritySemaphore(concurrency)
+        scheduler = AssetScheduler(self.sizes)
+        pending = set()
+        scheduled = set()
+        scheduled_pages = set()
+        media_urls = set()
+        ranged = not inspect.iscoroutinefunction(client.get)
+
+        async def fetch_page(link, order):
+            on_discover = None
+            if self.streaming:
+                def on_discover(kind, urls):        # runs in the download thread
+                    loop.call_soon_threadsafe(discovered, link, kind, urls)
+
+            async with semaphore.slot(scheduler.page_priority(order)):
+                try:
+                    page = await Page.fetch(link, client, on_discover=on_discover, **self.page_options)
+                except NotHTMLError as e:
+                    await asyncio.to_thread(self.save_file_link, link, e, warc=self.warc if ranged else None)
+                    return link
+                if self.fingerprints is not None:
+                    original = self.find_duplicate(link, await asyncio.to_thread(simhash, page.text))
+                    if original is not None:
+                        self.skip_duplicate(link, original)
+                        return None
+                if not self.images_only:
+                    self.file_saved(await asyncio.to_thread(page.download))
+                return page
+
+        async def fetch_asset(asset, order):
+            async with semaphore.slot(scheduler.priority(str(asset), order)):
+                if ranged and str(asset) in media_urls:
+                    if await asyncio.to_thread(self.download_media, asset, client):
+                        return asset
+                file = await Page.aget(str(asset), client, warc=self.warc, limits=self.limits, bandwidth=self.bandwidth)
+                await asyncio.to_thread(self.save_asset, asset, file)
+                return asset
+
+        def schedule(link, coroutine, order):
+            scheduled.add(str(link))
+            task = asyncio.ensure_future(coroutine(link, order))
+            task.link = link
+            pending.add(task)
+
+        def schedule_page(link):
+            key = self.canonicalize(str(link))
+            if len(scheduled_pages) < MAX_PAGES and key not in scheduled_pages \
+                    and str(link) not in scheduled and self.should_visit(link):
+                self.page_order.setdefault(str(link), len(scheduled_pages))
+                scheduled_pages.add(key)
+                schedule(link, fetch_page, self.page_order[str(link)])
+
+        async def probe(link, order, assets):
+            '''HEADs the assets of a page whose size is unknown in one batch, then queues them'''
+            async with semaphore.slot(scheduler.page_priority(order)):
+                await asyncio.to_thread(self.sizes.probe, assets, client)
+            for asset in assets:
+                schedule(asset, fetch_asset, order)
+
+        def schedule_assets(link, assets, order):
+            assets = [
+                asset for asset in assets
+                if str(asset) not in scheduled and str(asset) not in self.visited_assets
+                and self.failures.should_fetch(str(asset))
+            ]
+            if ranged and self.probe_sizes and any(self.sizes.get(asset) is None for asset in assets):
+                scheduled.update(str(asset) for asset in assets)
+                task = asyncio.ensure_future(probe(link, order, assets))
+                task.link = link
+                pending.add(task)
+                return
+            for asset in assets:
+                schedule(asset, fetch_asset, order)
 
-        return
+        def schedule_page_assets(page):
+            if self.include_media and not self.images_only:
+                media_urls.update(str(link) for link in page.get_media())
+            schedule_assets(page.link, self.assets_of(page), self.page_order.get(page.url, 0))
+
+        def discovered(link, kind, urls):
+            '''queues the urls streamed out of a page which is still downloading
+
+            with ``near_duplicates`` the links of a page are only followed
+            once it is known not to be a duplicate
+            '''
+            if kind == PAGE:
+                if not self.single_page and self.fingerprints is None:
+                    depth = getattr(link, 'depth', 0) + 1
+                    for next_link in Link.url_to_links(urls, str(link), self.base_url, rules=self.rules, depth=depth):
+                        schedule_page(next_link)
+                return
+            if (self.images_only and kind != IMAGE) or (kind == MEDIA and not self.include_media):
+                return
+            assets = Link.url_to_links(urls, str(link), self.base_url)
+            if kind == MEDIA:
+                media_urls.update(str(asset) for asset in assets)
+            schedule_assets(link, assets, self.page_order.get(str(link), 0))
+
+        if self.use_sitemaps:
+            await asyncio.to_thread(self.seed)
+        schedule_page(Link(self.base_url, page_url=self.base_url, base_url=self.base_url))
+        while self.site_links:
+            schedule_page(self.site_links.pop())
+
+        print('Browsing site...')
+        while pending:
+            # ``pending`` is updated in place, tasks are added to it while waiting
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending -= done
+            for task in done:
+                link = task.link
+                try:
+                    result = task.result()
+                except FileAlreadyExists:
+                    continue
+                except Exception as e:
+                    self.fail(link, e)
+                    continue
+                if result is None:          # a near duplicate, or the assets of a page probed
+                    continue
+
+                if isinstance(result, Page):
+                    print('++ {}'.format(str(link)))
+                    self.add_page(link, result)
+                    schedule_page_assets(result)
+                    if not self.single_page:
+                        for next_link in result.get_links():
+                            schedule_page(next_link)
+                yield result
 
     def download_page(self, page: Page, session=None, images=False, media=True, *args, **kwargs):
         '''downloads the asset pointed to by the link'''
@@ -157,48 +507,186 @@ class Site:
         if images:
             return self.download(images)
         cssjs = page.get_cssjs()
-        if media:
-            media_files = page.get_images()
+        media_files = page.get_media() if media else []
         assets = [*images, *cssjs, *media_files]
         pages = [page,]
         self.download(assets=assets, pages=pages)
 
         
     def download(self, assets: List[Link]=[], pages: List[Page]=[], session=None, recursive=False):
-        for page in pages:
-            page.download()
+        '''writes the pages and downloads the assets, see ``scheduler.AssetScheduler`` for the order'''
+        session = session or self.session
+        if self.probe_sizes:
+            self.sizes.probe(assets, session)
+        scheduler = AssetScheduler(self.sizes)
+        for order, page in enumerate(pages):
+            scheduler.push_page(page, self.page_order.get(page.url, order))
+        for asset in assets:
+            scheduler.push_asset(asset, self.asset_pages.get(str(asset), 0))
 
         print("\n"*3, "*" * 8, "     DOWNLOADING STATIC FILES     ", "*" * 8, "\n")
         extra_links = set()
-        for asset in assets:
-            if str(asset) in self.visited_links:
+        media = {str(link) for link in self.media} if self.include_media else set()
+        for asset in scheduler:
+            if isinstance(asset, Page):
+                self.file_saved(asset.download())
+                continue
+            if str(asset) in self.visited_assets:
+                continue
+            if not self.failures.should_fetch(str(asset)):
                 continue
 
             try:
                 url = str(asset)
-                response = session.get(url, allow_redirects=True, timeout=10)
-                file = response.content
+                if url in media and self.download_media(asset, session):
+                    continue
+                file = Page.get(url, session=session, warc=self.warc, limits=self.limits, bandwidth=self.bandwidth)
 
                 if recursive and (asset.is_css or asset.is_js):
                     internal_links = find_urls(str(file))
                     extra_links.update(internal_links)
-                save_file(path=asset.relative, content=file)
+                self.save_asset(asset, file)
             except FileAlreadyExists:
                 continue
-            except Exception:
-                logger.exception('file download failed')
-                print("--", asset)
-                STATS['errors'] += 1
+            except Exception as e:
+                self.fail(asset, e)
                 continue
-            else:
-                self.visited_links.append(url)
-                print("++", asset)
-                
-                STATS['assets'] += 1
         if recursive:
             self.download(assets=extra_links, session=session, recursive=False)
     
 
+    def save_asset(self, asset: Link, file: bytes):
+        '''writes a downloaded asset to its path in the export'''
+        path = save_file(path=self.index.path_for(asset), content=file)
+        self.sizes.record(asset, len(file))
+        self.asset_saved(asset)
+        self.file_saved(path)
+
+    def download_media(self, asset: Link, session) -> bool:
+        '''downloads a large media file in parallel range requests
+
+        returns False if the file is small or the server does not
+        support ranges, the asset is then downloaded as usual. Range
+        requests are not recorded, so with a WARC writer every file is
+        downloaded as usual
+        '''
+        if self.warc is not None:
+            return False
+        path = self.index.path_for(asset)
+        if not download_ranged(str(asset), path, session, max_size=self.limits.max_size, bandwidth=self.bandwidth):
+            return False
+        self.asset_saved(asset)
+        self.file_saved(path)
+        return True
+
+    def save_file_link(self, link: Link, error: NotHTMLError, warc: WARCWriter = None):
+        '''saves a page link which turned out to be a file (e.g a pdf) as an asset
+
+        the body of the response from the page request is used, so the
+        file is not requested again
+        '''
+        file = Page.receive(str(link), error.response, warc=warc, limits=self.limits, bandwidth=self.bandwidth)
+        self.save_asset(link, file)
+
+    def file_saved(self, path: str):
+        '''hands a file written to the export to the optimizer, if any'''
+        if self.optimizer is not None and path:
+            self.optimizer.submit(path)
+
+    def asset_saved(self, asset: Link):
+        self.failures.forget(str(asset))
+        self.visited_links.append(str(asset))
+        self.visited_assets.add(str(asset))
+        print("++", asset)
+        STATS['assets'] += 1
+
+    def assets_of(self, page: Page) -> List[Link]:
+        '''returns the assets of a page which are downloaded with it'''
+        assets = page.get_images()
+        if not self.images_only:
+            assets = [*assets, *page.get_cssjs()]
+            if self.include_media:
+                assets.extend(page.get_media())
+        return assets
+
+    def should_visit(self, link: Link) -> bool:
+        '''checks if a queued page link still needs to be fetched'''
+        if not validate_url(str(link), check_if_exist=False):
+            logger.error(f'Badly formed URL: {str(link)}')
+            return False
+        return self.canonicalize(str(link)) not in self.seen and self.failures.should_fetch(str(link))
+
+    def add_page(self, link: Link, page: Page):
+        '''records a fetched page and the assets it links to'''
+        self.pages[str(link)] = page
+        self.seen.add(self.canonicalize(str(link)))
+        self.failures.forget(str(link))
+        order = self.page_order.setdefault(str(link), len(self.page_order))
+        images, cssjs, media = page.get_images(), page.get_cssjs(), page.get_media()
+        for asset in (*images, *cssjs, *media):
+            self.asset_pages.setdefault(str(asset), order)
+        self.index.update([link, *images, *cssjs, *media])
+        self.images.update(images)
+        self.cssjs.update(cssjs)
+        self.media.update(media)
+        STATS['pages'] += 1
+
+    def find_duplicate(self, link: Link, fingerprint: int):
+        '''returns the link of a kept page which ``link`` nearly duplicates
+
+        otherwise ``link`` is kept and later pages are compared against it
+        '''
+        original = self.fingerprints.find(fingerprint)
+        if original is None:
+            self.fingerprints.add(fingerprint, link)
+        return original
+
+    def skip_duplicate(self, link: Link, original: Link):
+        '''drops a near duplicate page, its url is saved to the path of ``original``
+
+        pages saved before the duplicate was found may already link to its
+        own path, a redirect to ``original`` is written there
+        '''
+        self.seen.add(self.canonicalize(str(link)))
+        self.duplicates[str(link)] = str(original)
+        self.failures.forget(str(link))
+        path = self.index.alias(link, original)
+        target = self.index.path_for(original)
+        if path is not None and path != target:
+            try:
+                save_file(path, redirect_page(path, target))
+            except FileAlreadyExists:
+                pass
+        print('==', link, '->', original)
+        STATS['duplicates'] += 1
+
+    def fail(self, link: Link, error: Exception):
+        '''logs a failed download and records it in the failure cache
+
+        the traceback is only logged the first time a url fails
+        '''
+        failure = self.failures.record(str(link), error)
+        if failure.attempts == 1:
+            logger.exception(f'-- failed {str(link)}', exc_info=error)
+        else:
+            logger.error(f'-- failed {str(link)} again ({failure.error} x{failure.attempts})')
+        print('--', link)
+        STATS['errors'] += 1
+
+    def seed(self, limit: int = MAX_PAGES):
+        '''queues the internal pages listed in the site's sitemaps'''
+        print('Reading sitemaps...')
+        seeded = 0
+        for url in iter_sitemap_urls(self.base_url, self.session):
+            if seeded >= limit:
+                break
+            if not Link.is_internal(url, self.base_url):
+                continue
+            if self.rules is None or self.rules.allows(url, self.base_url):
+                self.site_links.append(Link(url, page_url=self.base_url, base_url=self.base_url))
+                seeded += 1
+        return seeded
+
     def browse(self, homepage: str):
         '''downloads all the static pages
         then adds all the static files to ``static_assets``,
@@ -206,28 +694,32 @@ class Site:
         processing
         '''
         homepage = Link(homepage, page_url=homepage, base_url=self.base_url)
+        if self.use_sitemaps:
+            self.seed()
         self.site_links.append(homepage)
         print('Browsing site...')
         while len(self.site_links) and len(self.pages) < MAX_PAGES:
             link = self.site_links.pop()
-            
-            if not validate_url(str(link), check_if_exist=False):
-                logger.error(f'Badly formed URL: {str(link)}')
-                continue
-            if str(link) in self.pages.keys():
+            if not self.should_visit(link):
                 continue
 
             print('++ {}'.format(str(link)))
             try:
-                page = Page(link, session=self.session, base_url=self.base_url)
-                self.pages[str(link)] = page
-                self.images.update(page.get_images())
-                self.cssjs.update(page.get_cssjs())
-                self.media.update(page.get_media())
+                page = Page(link, session=self.session, **self.page_options)
+                if self.fingerprints is not None:
+                    original = self.find_duplicate(link, simhash(page.text))
+                    if original is not None:
+                        self.skip_duplicate(link, original)
+                        continue
+                self.add_page(link, page)
                 self.site_links.extend(page.get_links())
+            except NotHTMLError as e:
+                try:
+                    self.save_file_link(link, e, warc=self.warc)
+                except FileAlreadyExists:
+                    pass
+                except Exception as error:
+                    self.fail(link, error)
 
-            except:
-                STATS['errors'] += 1
-                logger.exception(f'-- failed {str(link)}')
-            else:
-                STATS['pages'] += 1
+            except Exception as e:
+                self.fail(link, e)
@@ -0,0 +1,74 @@
+'''extracts links from a page while it is still downloading'''
+
+import codecs
+from html.parser import HTMLParser
+from typing import Callable, List
+
+PAGE = 'page'
+CSSJS = 'cssjs'
+IMAGE = 'image'
+MEDIA = 'media'
+
+
+class LinkExtractor(HTMLParser):
+    '''An incremental tokenizer reporting the links of a page as they arrive
+
+    ...
+
+    ``feed`` it the raw chunks of the response and ``callback(kind, urls)``
+    is called with the urls found in each chunk, ``kind`` being one of
+    ``PAGE``, ``CSSJS``, ``IMAGE`` or ``MEDIA``. Only the urls which can be
+    told apart from a single tag are reported (e.g not ``srcset``
+    candidates), the full parse of the page remains the reference.
+
+    Attributes
+    ----------
+    callback (callable)
+        called with the kind and the list of urls found
+    encoding (str)
+        the encoding the chunks are decoded with
+    '''
+
+    def __init__(self, callback: Callable[[str, List[str]], None], encoding: str = 'utf-8') -> None:
+        super().__init__()
+        self.callback = callback
+        self.encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._found = {}
+
+    def feed_bytes(self, chunk: bytes):
+        '''feeds a raw chunk of the response, reporting the urls found in it'''
+        self.feed(self._decoder.decode(chunk))
+        self.report()
+
+    def report(self):
+        found, self._found = self._found, {}
+        for kind, urls in found.items():
+            self.callback(kind, urls)
+
+    def close(self):
+        self.feed(self._decoder.decode(b'', final=True))
+        super().close()
+        self.report()
+
+    def found(self, kind: str, url: str):
+        if url:
+            self._found.setdefault(kind, []).append(url.strip())
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'a':
+            self.found(PAGE, attrs.get('href'))
+        elif tag == 'link':
+            rel = (attrs.get('rel') or '').lower().split()
+            self.found(IMAGE if 'icon' in rel else CSSJS, attrs.get('href'))
+        elif tag == 'script':
+            self.found(CSSJS, attrs.get('src'))
+        elif tag == 'img' and not attrs.get('srcset'):
+            self.found(IMAGE, attrs.get('src'))
+        elif tag in ('video', 'audio', 'source', 'track'):
+            self.found(MEDIA, attrs.get('src'))
+            if tag == 'video':
+                self.found(MEDIA, attrs.get('poster'))
+
+    handle_startendtag = handle_starttag
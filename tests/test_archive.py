@@ -0,0 +1,108 @@
+import os
+import tarfile
+import zipfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+import archive
+from archive import make_archive, make_zip, walk, SMALL_FILE
+from exceptions import InvalidInputError
+from utils import export
+
+FILES = {
+    'site/index.html': b'<html>' + b'<p>hello world</p>' * 10000 + b'</html>',
+    'site/about.html': b'<html>about</html>',
+    'site/static/style.css': b'body { color: red; }\n' * 5000,
+    'site/static/app.js': os.urandom(SMALL_FILE * 2),
+    'site/images/logo.png': b'\x89PNG' + b'\x00' * 5000,
+}
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'export')
+        for name, content in FILES.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        self.base_name = os.path.join(self.tmp.name, 'example')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_walk(self):
+        self.assertEqual(sorted(name for _, name in walk(self.root)), sorted(FILES))
+
+    def test_parallel_zip(self):
+        filename = make_archive(self.base_name, self.root, jobs=2)
+        self.assertEqual(filename, self.base_name + '.zip')
+        with zipfile.ZipFile(filename) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(sorted(zf.namelist()), sorted(FILES))
+            for name, content in FILES.items():
+                self.assertEqual(zf.read(name), content)
+            info = zf.getinfo('site/index.html')
+            self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+            self.assertLess(info.compress_size, info.file_size)
+
+    def check_zip(self, filename):
+        with zipfile.ZipFile(filename) as zf:
+            self.assertIsNone(zf.testzip())
+            for name, content in FILES.items():
+                self.assertEqual(zf.read(name), content)
+
+    def test_window_is_bounded_by_bytes(self):
+        submitted = []
+
+        class Pool(ThreadPoolExecutor):
+            def submit(self, fn, path, *args):
+                submitted.append(path)
+                return super().submit(fn, path, *args)
+
+        with mock.patch.object(archive, 'WINDOW_SIZE', 1), \
+                mock.patch.object(archive, 'LARGE_FILE', len(FILES['site/index.html']) - 1), \
+                mock.patch.object(archive, 'ProcessPoolExecutor', Pool):
+            filename = make_zip(self.base_name + '.zip', self.root, jobs=1)
+        self.check_zip(filename)
+        # index.html is over LARGE_FILE and written in process, the others go to the pool
+        self.assertEqual(sorted(os.path.basename(path) for path in submitted), ['app.js', 'style.css'])
+
+    def test_fallback_without_zipfile_internals(self):
+        with mock.patch.object(archive, 'writes_deflated', return_value=False), \
+                mock.patch.object(archive, 'write_deflated') as write_deflated:
+            filename = make_zip(self.base_name + '.zip', self.root, jobs=2)
+        write_deflated.assert_not_called()
+        self.check_zip(filename)
+
+    def test_store_media(self):
+        filename = make_zip(self.base_name + '.zip', self.root, jobs=2, store_media=True)
+        with zipfile.ZipFile(filename) as zf:
+            self.assertEqual(zf.getinfo('site/images/logo.png').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(zf.getinfo('site/static/style.css').compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(zf.read('site/images/logo.png'), FILES['site/images/logo.png'])
+
+    def test_export_uses_the_archiver(self):
+        filename = export(dir_name=self.root, filename=self.base_name + '.zip', jobs=1)
+        with zipfile.ZipFile(filename) as zf:
+            self.assertEqual(sorted(zf.namelist()), sorted(FILES))
+
+    def test_tar_zst(self):
+        try:
+            import zstandard
+        except ImportError:
+            with self.assertRaises(InvalidInputError):
+                make_archive(self.base_name, self.root, 'tar.zst')
+            return
+
+        filename = make_archive(self.base_name, self.root, 'tar.zst', jobs=2)
+        with open(filename, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader, \
+                tarfile.open(fileobj=reader, mode='r|') as tar:
+            names = [member.name for member in tar]
+        self.assertEqual(sorted(names), sorted(FILES))
+
+    def test_unknown_format(self):
+        with self.assertRaises(InvalidInputError):
+            make_archive(self.base_name, self.root, 'rar')
@@ -0,0 +1,100 @@
+from unittest import TestCase, mock
+import io
+import os
+import tempfile
+
+from requests import Response
+
+from dedupe import URLCanonicalizer, SimHashIndex, simhash, hamming, redirect_page
+from models import Link, PathIndex
+from sites import Site
+
+ARTICLE = ' '.join(f'word{i}' for i in range(300))
+
+
+class URLCanonicalizerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.canonicalize = URLCanonicalizer()
+
+    def test_strips_tracking_params_and_fragment(self):
+        self.assertEqual(
+            self.canonicalize('https://Example.com/about?utm_source=x&PHPSESSID=1#team'),
+            'https://example.com/about'
+        )
+
+    def test_sorts_query(self):
+        self.assertEqual(
+            self.canonicalize('https://example.com/list?sort=asc&page=2'),
+            self.canonicalize('https://example.com/list?page=2&sort=asc')
+        )
+
+    def test_trailing_slash(self):
+        self.assertNotEqual(self.canonicalize('https://example.com/about/'), 'https://example.com/about')
+        canonicalize = URLCanonicalizer(strip_trailing_slash=True, strip_params=['sort'])
+        self.assertEqual(canonicalize('https://example.com/about/?sort=asc'), 'https://example.com/about')
+        self.assertEqual(canonicalize('https://example.com/'), 'https://example.com/')
+
+
+class SimHashTestCase(TestCase):
+    def test_near_duplicates_are_close(self):
+        edited = ARTICLE.replace('word150', 'changed')
+        self.assertLessEqual(hamming(simhash(ARTICLE), simhash(edited)), 3)
+        self.assertGreater(hamming(simhash(ARTICLE), simhash('something else entirely, nothing alike')), 3)
+
+    def test_index_finds_near_duplicates(self):
+        index = SimHashIndex(distance=3)
+        index.add(0b1011 << 40, 'a')
+        self.assertEqual(index.find(0b1011 << 40 | 0b111), 'a')
+        self.assertIsNone(index.find(0b1011 << 40 | 0b1111))
+        self.assertIsNone(index.find(1 << 63))
+
+
+class PathIndexTestCase(TestCase):
+    def test_variants_share_a_path(self):
+        index = PathIndex(canonicalize=URLCanonicalizer())
+        base = 'https://example.com'
+        about = Link('https://example.com/about', page_url=base, base_url=base)
+        variant = Link('https://example.com/about?utm_source=x', page_url=base, base_url=base)
+        self.assertEqual(index.path_for(about), index.path_for(variant))
+        self.assertEqual(len(index), 1)
+
+    def test_redirect_page(self):
+        self.assertIn(b'url=../index.html', redirect_page('blog/post.html', 'index.html'))
+
+
+class SiteDuplicatesTestCase(TestCase):
+    BASE = 'https://example.com'
+    PAGES = {
+        'https://example.com': '<a href="/a?sid=1">a</a><a href="/a?sid=2">a</a><a href="/b">b</a><p>home</p>',
+        'https://example.com/a': f'<a href="/a/next">next</a><p>{ARTICLE}</p>',
+        'https://example.com/b': f'<a href="/b/next">next</a><p>{ARTICLE} extra</p>',
+    }
+
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def get(self, url, **kwargs):
+        url = URLCanonicalizer()(url)
+        res = Response()
+        res.status_code = 200 if url in self.PAGES else 404
+        res._content = self.PAGES.get(url, '').encode('utf8')
+        return res
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_browse_skips_duplicates(self, mocked_io):
+        site = Site(self.BASE, near_duplicates=3)
+        site.session.get = mock.Mock(side_effect=self.get)
+        site.browse(self.BASE)
+        requested = [call.args[0] for call in site.session.get.call_args_list]
+        self.assertEqual(len([url for url in requested if url.startswith('https://example.com/a?')]), 1)
+        self.assertEqual(len(site.duplicates), 1)
+        self.assertEqual(len(site.pages), 2)
+        # the links of the duplicate are not followed
+        followed = {'https://example.com/a/next', 'https://example.com/b/next'} & set(requested)
+        self.assertEqual(len(followed), 1)
@@ -0,0 +1,88 @@
+import io
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import requests
+from requests import Response
+
+from failures import FailureCache
+from exceptions import PageNotFoundError, AuthenticationError
+from sites import Site
+
+DEAD_LINK = 'https://example.com/indexoil.html'
+
+
+class FailureCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cache = FailureCache()
+
+    def test_unknown_url_is_fetched(self):
+        self.assertTrue(self.cache.should_fetch(DEAD_LINK))
+        self.assertNotIn(DEAD_LINK, self.cache)
+
+    def test_not_found_is_never_retried(self):
+        record = self.cache.record(DEAD_LINK, PageNotFoundError())
+        self.assertEqual(record.status, 404)
+        self.assertEqual(record.error, 'PageNotFoundError')
+        self.assertFalse(self.cache.should_fetch(DEAD_LINK))
+
+    def test_other_errors_are_retried(self):
+        for _ in range(2):
+            self.cache.record(DEAD_LINK, requests.ConnectionError())
+            self.assertTrue(self.cache.should_fetch(DEAD_LINK))
+        self.cache.record(DEAD_LINK, requests.ConnectionError())
+        self.assertFalse(self.cache.should_fetch(DEAD_LINK))
+        self.assertEqual(self.cache.get(DEAD_LINK).attempts, 3)
+
+    def test_policy_by_error_class(self):
+        cache = FailureCache(policy={'AuthenticationError': 1, Exception: 0})
+        cache.record(DEAD_LINK, AuthenticationError())
+        self.assertTrue(cache.should_fetch(DEAD_LINK))
+        cache.record(DEAD_LINK, AuthenticationError())
+        self.assertFalse(cache.should_fetch(DEAD_LINK))
+
+    def test_records_expire(self):
+        cache = FailureCache(ttl=-1)
+        cache.record(DEAD_LINK, PageNotFoundError())
+        self.assertTrue(cache.should_fetch(DEAD_LINK))
+        self.assertEqual(len(cache), 0)
+
+    def test_forget(self):
+        self.cache.record(DEAD_LINK, PageNotFoundError())
+        self.cache.forget(DEAD_LINK)
+        self.assertTrue(self.cache.should_fetch(DEAD_LINK))
+
+    def test_persists_between_runs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'failures.json')
+            cache = FailureCache(path=path)
+            cache.record(DEAD_LINK, PageNotFoundError())
+            cache.save()
+
+            cache = FailureCache(path=path)
+            self.assertFalse(cache.should_fetch(DEAD_LINK))
+            self.assertEqual(cache.get(DEAD_LINK).status, 404)
+
+
+class SiteFailureTestCase(TestCase):
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_dead_links_are_fetched_once(self, mocked_io):
+        def get(url, **kwargs):
+            res = Response()
+            if url == DEAD_LINK:
+                res.status_code = 404
+            else:
+                res.status_code = 200
+                res._content = f'<a href="{DEAD_LINK}">dead</a><a href="/page{len(url)}">next</a>'.encode()
+            return res
+
+        site = Site('https://example.com')
+        site.session = mock.Mock()
+        site.session.get.side_effect = get
+        site.browse('https://example.com')
+
+        dead = [call for call in site.session.get.call_args_list if call.args[0] == DEAD_LINK]
+        self.assertEqual(len(dead), 1)
+        self.assertFalse(site.failures.should_fetch(DEAD_LINK))
+        self.assertGreater(len(site.pages), 1)
@@ -0,0 +1,167 @@
+from unittest import TestCase, mock
+import io
+import os
+import json
+import tempfile
+
+from requests import Response
+
+from frontier import Frontier, SQLiteFrontier, FrontierPathIndex, crawl, work, seed, PAGE, ASSET, DONE, FAILED, PENDING
+from models import Link
+from sites import Site
+from scheduler import TokenBucket
+from main import main
+
+BASE = 'https://example.com'
+# /login.php and /login.html both want login.html
+LOGIN_PAGES = {
+    'https://example.com': b'<a href="/login.php">one</a><a href="/login.html">two</a><img src="/logo.png">',
+    'https://example.com/login.php': b'<p>form one</p><a href="/login.html">two</a>',
+    'https://example.com/login.html': b'<p>form two</p><a href="/login.php">one</a>',
+}
+PAGES = {
+    'https://example.com': b'<a href="/about">about</a><a href="/missing">missing</a><img src="/logo.png">',
+    'https://example.com/about': b'<a href="/">home</a><script src="/app.js"></script><img src="/logo.png">',
+}
+
+
+def link(url):
+    return Link(url, page_url=BASE, base_url=BASE)
+
+
+class SQLiteFrontierTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.frontier = SQLiteFrontier(os.path.join(self.tmp.name, 'frontier.db'), max_pages=3)
+
+    def tearDown(self) -> None:
+        self.frontier.close()
+        self.tmp.cleanup()
+
+    def test_add_once(self):
+        self.assertEqual(self.frontier.add([link(BASE), link(BASE + '/about')], PAGE), 2)
+        self.assertEqual(self.frontier.add([link(BASE)], PAGE), 0)
+        self.assertEqual(self.frontier.add([link(BASE + '/a'), link(BASE + '/b')], PAGE), 1)  # max_pages
+
+    def test_complete_exactly_once(self):
+        self.frontier.add([link(BASE)], PAGE)
+        lease, = self.frontier.lease('one')
+        self.assertEqual(self.frontier.lease('two'), [])
+        self.assertTrue(self.frontier.complete(lease, assets=[link(BASE + '/logo.png')]))
+        self.assertFalse(self.frontier.complete(lease))
+        self.assertEqual(self.frontier.counts(), {PAGE: {DONE: 1}, ASSET: {PENDING: 1}})
+
+    def test_expired_lease(self):
+        self.frontier.add([link(BASE)], PAGE)
+        stale, = self.frontier.lease('one', ttl=-1)
+        fresh, = self.frontier.lease('two')
+        self.assertFalse(self.frontier.complete(stale, links=[link(BASE + '/about')]))
+        self.assertTrue(self.frontier.complete(fresh))
+        self.assertEqual(self.frontier.counts(), {PAGE: {DONE: 1}})
+        self.assertTrue(self.frontier.finished())
+
+    def test_paths_are_numbered_once(self):
+        paths = self.frontier.assign_paths([link(BASE + '/login.php'), link(BASE + '/login.html')])
+        self.assertEqual(sorted(paths.values()), ['login-2.html', 'login.html'])
+        other = SQLiteFrontier(self.frontier.path)
+        self.assertEqual(other.assign_paths([link(BASE + '/login.html')]), {BASE + '/login.html': paths[BASE + '/login.html']})
+        other.close()
+
+    def test_backends_implement_every_method(self):
+        class Partial(Frontier):
+            def add(self, links, kind):
+                return 0
+        with self.assertRaises(TypeError):
+            Partial()
+
+    def test_fail_retries(self):
+        self.frontier.add([link(BASE)], PAGE)
+        lease, = self.frontier.lease('one')
+        self.frontier.fail(lease, 'timeout', retries=1)
+        self.assertFalse(self.frontier.finished())
+        lease, = self.frontier.lease('one')
+        self.frontier.fail(lease, 'timeout', retries=1)
+        self.assertEqual(self.frontier.counts(), {PAGE: {FAILED: 1}})
+        self.assertTrue(self.frontier.finished())
+
+
+class WorkTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.frontier = SQLiteFrontier('frontier.db')
+
+    def tearDown(self) -> None:
+        self.frontier.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @staticmethod
+    def get(url, **kwargs):
+        res = Response()
+        res.status_code = 404 if url.endswith('/missing') else 200
+        res._content = PAGES.get(url, b'asset')
+        return res
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_work(self, mocked_io):
+        site = Site(BASE)
+        site.session.get = mock.Mock(side_effect=self.get)
+        seed(site, self.frontier)
+        work(site, self.frontier, idle=0)
+
+        counts = self.frontier.counts()
+        self.assertEqual(counts[PAGE], {DONE: 2, FAILED: 1})
+        self.assertEqual(counts[ASSET], {DONE: 2})
+        requested = [call.args[0] for call in site.session.get.call_args_list]
+        self.assertEqual(requested.count('https://example.com/logo.png'), 1)
+        self.assertTrue(os.path.exists('index.html'))
+
+
+def fake_get(self, url, **kwargs):
+    res = Response()
+    res.status_code = 200
+    res.headers['Content-Type'] = 'text/html' if url in LOGIN_PAGES else 'image/png'
+    res._content = LOGIN_PAGES.get(url, b'png')
+    return res
+
+
+class CrawlTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    @mock.patch('requests.Session.get', fake_get)      # inherited by the forked workers
+    def test_workers_agree_on_paths(self, mocked_io):
+        site = Site(BASE)
+        frontier = SQLiteFrontier('frontier.db', canonicalize=site.canonicalize)
+        site.index = FrontierPathIndex(frontier)
+        counts = crawl(site, frontier, workers=3, options={}, idle=0.05)
+        site.index.load()
+        frontier.close()
+
+        self.assertEqual(counts, {PAGE: {DONE: 3}, ASSET: {DONE: 1}})
+        site.index.export('manifest.json')
+        with open('manifest.json') as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(manifest.values()), ['index.html', 'login-2.html', 'login.html', 'logo.png'])
+        for url, marker in [(BASE + '/login.php', b'form one'), (BASE + '/login.html', b'form two')]:
+            with open(manifest[url], 'rb') as f:
+                self.assertIn(marker, f.read())
+        with open('index.html', 'rb') as f:
+            home = f.read()
+        self.assertIn(f'href="{manifest[BASE + "/login.php"]}"'.encode(), home)
+        self.assertIn(f'href="{manifest[BASE + "/login.html"]}"'.encode(), home)
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_bandwidth_is_split_between_workers(self, mocked_io):
+        with mock.patch('frontier.crawl', return_value={}) as crawl_:
+            main(BASE, base_dir=self.tmp.name, frontier_db='frontier.db', workers=4, bandwidth=TokenBucket(4096))
+        self.assertEqual(crawl_.call_args.kwargs['options']['bandwidth'].rate, 1024)
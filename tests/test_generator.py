@@ -9,7 +9,8 @@ import io
 from unittest import TestCase
 from unittest.mock import patch
 
-from generator import Parser
+from generator import Parser, parse_srcset, choose_candidates
+from exceptions import InvalidInputError
 
 class ParserTestCase(TestCase):
     '''TestCase for Parser'''
@@ -68,3 +69,75 @@ class ParserTestCase(TestCase):
         self.assertIsInstance(images, list)
         self.assertTrue(all(str(s).startswith(self.base_url) for s in images))
         self.assertIn('https://example.com/static/images/page2.jpeg', [str(s) for s in images])
+
+    def test_get_media_works(self):
+        html = '''
+            <style>
+                @font-face { font-family: Sans; src: url("/fonts/sans.woff2") format("woff2"); }
+                body { background: url(/static/bg.png); }
+            </style>
+            <video src="/media/intro.mp4" poster="/media/poster.jpg">
+                <source src="/media/intro.webm" type="video/webm">
+                <track src="/media/subtitles.vtt" kind="subtitles">
+            </video>
+            <audio><source src="/media/theme.mp3"></audio>
+            <video src="https://cdn.example.org/video.mp4"></video>
+        '''
+        parser = Parser(html=html, page_url=self.base_url, base_url=self.base_url)
+        media = [str(s) for s in parser.get_media()]
+        self.assertEqual(sorted(media), [
+            'https://example.com/fonts/sans.woff2',
+            'https://example.com/media/intro.mp4',
+            'https://example.com/media/intro.webm',
+            'https://example.com/media/poster.jpg',
+            'https://example.com/media/subtitles.vtt',
+            'https://example.com/media/theme.mp3',
+        ])
+
+    def test_srcset_images_are_found(self):
+        html = '''
+            <picture>
+                <source srcset="/img/hero.webp 1x, /img/hero@2x.webp 2x">
+                <img src="/img/hero.jpg" srcset="/img/hero-480.jpg 480w, /img/hero-800.jpg 800w">
+            </picture>
+        '''
+        parser = Parser(html=html, page_url=self.base_url, base_url=self.base_url)
+        images = [str(s) for s in parser.get_images()]
+        self.assertEqual(len(images), 5)
+        self.assertIn('https://example.com/img/hero@2x.webp', images)
+        self.assertIn('https://example.com/img/hero-800.jpg', images)
+
+    def test_parse_srcset(self):
+        self.assertEqual(parse_srcset('a.jpg 1x, b.jpg 2x'), [('a.jpg', '1x'), ('b.jpg', '2x')])
+        self.assertEqual(parse_srcset('a.jpg'), [('a.jpg', '1x')])
+        self.assertEqual(parse_srcset('img,1.jpg 480w,img,2.jpg 800w'), [('img,1.jpg', '480w'), ('img,2.jpg', '800w')])
+
+    def test_image_policy_selects_srcset_candidates(self):
+        html = (
+            '<img src="/img/hero.jpg" srcset="/img/hero-480.jpg 480w, /img/hero-800.jpg 800w, /img/hero-1600.jpg 1600w">'
+            '<img src="/img/logo.png">'
+        )
+        expected = {
+            'largest': 'https://example.com/img/hero-1600.jpg',
+            'smallest': 'https://example.com/img/hero-480.jpg',
+            'max-width=1000': 'https://example.com/img/hero-800.jpg',
+            'max-width=100': 'https://example.com/img/hero-480.jpg',
+        }
+        for policy, image in expected.items():
+            parser = Parser(html=html, page_url=self.base_url, base_url=self.base_url, image_policy=policy)
+            images = sorted(str(s) for s in parser.get_images())
+            self.assertEqual(images, sorted([image, 'https://example.com/img/logo.png']), policy)
+            srcset = b'/img/hero-480.jpg 480w, /img/hero-800.jpg 800w, /img/hero-1600.jpg 1600w'
+            self.assertEqual(parser.transforms[srcset], image.replace(self.base_url, '').encode())
+
+    def test_invalid_image_policy(self):
+        with self.assertRaises(InvalidInputError):
+            Parser(html='', page_url=self.base_url, base_url=self.base_url, image_policy='biggest')
+        with self.assertRaises(InvalidInputError):
+            choose_candidates([], 'max-width=wide')
+
+    def test_density_descriptors(self):
+        candidates = parse_srcset('/a.jpg, /b.jpg 2x, /c.jpg 3x')
+        self.assertEqual(choose_candidates(candidates, 'largest'), [('/c.jpg', '3x')])
+        self.assertEqual(choose_candidates(candidates, 'smallest'), [('/a.jpg', '1x')])
+        self.assertEqual(choose_candidates(candidates, 'all'), candidates)
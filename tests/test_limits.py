@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+from unittest import TestCase, mock
+
+from requests import Response
+
+from limits import SizeLimits, content_type, is_html, read_body, MB
+from exceptions import ContentTooLargeError, NotHTMLError
+from sites import Site, Page
+
+PDF_LINK = 'https://example.com/files/report.pdf'
+
+
+def make_response(body: bytes, mime_type: str = None, length: bool = True):
+    res = Response()
+    res.status_code = 200
+    res.raw = io.BytesIO(body)
+    if mime_type:
+        res.headers['Content-Type'] = mime_type
+    if length:
+        res.headers['Content-Length'] = str(len(body))
+    return res
+
+
+class SizeLimitsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.limits = SizeLimits({'text/html': 100, 'image/': 1000}, max_size=500)
+
+    def test_content_type(self):
+        self.assertEqual(content_type({'Content-Type': 'text/HTML; charset=utf-8'}), 'text/html')
+        self.assertEqual(content_type({}), '')
+        self.assertTrue(is_html('text/html'))
+        self.assertTrue(is_html(''))
+        self.assertFalse(is_html('application/pdf'))
+
+    def test_limit_for(self):
+        self.assertEqual(self.limits.limit_for('text/html'), 100)
+        self.assertEqual(self.limits.limit_for('image/png'), 500)
+        self.assertEqual(self.limits.limit_for('application/zip'), 500)
+        self.assertEqual(SizeLimits().limit_for('image/png'), 50 * MB)
+
+    def test_announced_size_is_checked_before_reading(self):
+        response = make_response(b'x' * 200, 'text/html')
+        with mock.patch.object(response, 'close') as close, self.assertRaises(ContentTooLargeError):
+            read_body('https://example.com', response, self.limits)
+        self.assertEqual(response.raw.tell(), 0)
+        close.assert_called_once()
+
+    def test_streamed_body_is_capped(self):
+        response = make_response(b'x' * 200, 'text/html', length=False)
+        with self.assertRaises(ContentTooLargeError):
+            read_body('https://example.com', response, self.limits)
+
+    def test_body_is_kept_on_response(self):
+        response = make_response(b'<html></html>', 'text/html')
+        self.assertEqual(read_body('https://example.com', response, self.limits), b'<html></html>')
+        self.assertEqual(response.content, b'<html></html>')
+
+
+class ContentRoutingTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @staticmethod
+    def get(url, **kwargs):
+        if url == PDF_LINK:
+            return make_response(b'%PDF-1.4', 'application/pdf')
+        return make_response(f'<a href="{PDF_LINK}">report</a>'.encode(), 'text/html')
+
+    def test_page_get_refuses_other_content(self):
+        session = mock.Mock()
+        session.get.side_effect = self.get
+        with self.assertRaises(NotHTMLError) as context:
+            Page(PDF_LINK, session, base_url='https://example.com')
+        self.assertEqual(context.exception.content_type, 'application/pdf')
+        self.assertEqual(context.exception.response.raw.tell(), 0)
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_browse_saves_files_without_parsing_them(self, mocked_io):
+        site = Site('https://example.com')
+        site.session = mock.Mock()
+        site.session.get.side_effect = self.get
+        site.browse('https://example.com')
+
+        self.assertEqual(list(site.pages), ['https://example.com'])
+        self.assertIn(PDF_LINK, site.visited_links)
+        with open('files/report.pdf', 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4')
+        pdf_requests = [call for call in site.session.get.call_args_list if call.args[0] == PDF_LINK]
+        self.assertEqual(len(pdf_requests), 1)
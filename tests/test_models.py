@@ -1,6 +1,9 @@
+import os
+import json
+import tempfile
 from unittest import TestCase
 
-from models import Link
+from models import Link, PathIndex
 
 
 class ModelTestCase(TestCase):
@@ -71,4 +74,57 @@ class ModelTestCase(TestCase):
         l1 = Link('?page=login', page_url='https://example.com/account', base_url='https://example.com')
         l2 = Link('login', page_url='https://example.com/account', base_url='https://example.com')
         self.assertEqual(l1.url_to_path(), 'account/login.html')
-        self.assertEqual(l2.url_to_path(), 'account/login.html')
\ No newline at end of file
+        self.assertEqual(l2.url_to_path(), 'account/login.html')
+
+    def test_equal_links_are_kept_once(self):
+        l1 = Link('/about', page_url='https://example.com/account', base_url='https://example.com')
+        l2 = Link('/about', page_url='https://example.com/contact', base_url='https://example.com')
+        self.assertEqual({l1, l2}, {l1})
+
+    def test_link_is_compact(self):
+        self.assertFalse(hasattr(self.link, '__dict__'))
+        page_url = ''.join(['https://example.com/', 'accounts/login'])
+        link = Link('/about', page_url=page_url, base_url='https://example.com')
+        self.assertIs(link.page_url, self.link.page_url)
+        self.assertIs(link.base_url, self.link.base_url)
+
+    def test_derived_fields_are_cached(self):
+        self.assertIs(str(self.link), str(self.link))
+        self.assertIs(self.link.relative, self.link.relative)
+        self.assertEqual(self.link.relative, 'accounts/signup.html')
+
+
+class PathIndexTestCase(TestCase):
+    def setUp(self) -> None:
+        self.index = PathIndex()
+        self.page_url = 'https://example.com/account'
+        self.base_url = 'https://example.com'
+
+    def link(self, href):
+        return Link(href, page_url=self.page_url, base_url=self.base_url)
+
+    def test_path_for(self):
+        self.assertEqual(self.index.path_for(self.link('login')), 'account/login.html')
+        self.assertIn('https://example.com/account/login', self.index)
+        self.assertEqual(self.index.path_for(self.link('/account/login')), 'account/login.html')
+        self.assertEqual(len(self.index), 1)
+
+    def test_colliding_urls_get_numbered_paths(self):
+        first = self.index.path_for(self.link('?page=login&next=a'))
+        second = self.index.path_for(self.link('?page=login&next=b'))
+        third = self.index.path_for(self.link('?page=login&next=c'))
+        self.assertEqual(first, 'account/login.html')
+        self.assertEqual(second, 'account/login-2.html')
+        self.assertEqual(third, 'account/login-3.html')
+        self.assertEqual(self.index.path_for(self.link('?page=login&next=b')), 'account/login-2.html')
+
+    def test_export(self):
+        self.index.update([self.link('login'), self.link('?page=about')])
+        with tempfile.TemporaryDirectory() as directory:
+            filename = self.index.export(os.path.join(directory, 'manifest.json'))
+            with open(filename) as f:
+                manifest = json.load(f)
+        self.assertEqual(manifest, {
+            'https://example.com/account/login': 'account/login.html',
+            'https://example.com/account/?page=about': 'account/about.html',
+        })
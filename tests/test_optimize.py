@@ -0,0 +1,168 @@
+from unittest import TestCase, mock
+import os
+import gzip
+import zlib
+import struct
+import time
+import tempfile
+import threading
+
+import optimize
+from models import Link
+from sites import Site
+from optimize import Optimizer, optimize_file, minify_html, minify_css, minify_js, recompress_png, png_chunks
+
+
+def chunk(kind, body):
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+
+def make_png(width=64, height=64):
+    '''an rgb png stored without compression, its image data split in three chunks'''
+    rows = b''.join(b'\x00' + bytes(range(3 * width)) for _ in range(height))
+    data = zlib.compress(rows, 0)
+    size = len(data) // 3 + 1
+    return b''.join([
+        optimize.PNG_SIGNATURE,
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'tEXt', b'Comment\x00kept'),
+        *(chunk(b'IDAT', data[i:i + size]) for i in range(0, len(data), size)),
+        chunk(b'IEND', b''),
+    ])
+
+
+class MinifyTestCase(TestCase):
+    def test_html(self):
+        html = b'<html>\n  <body>\n    <!-- note -->\n    <p>a   b</p>\n<pre>  keep\n   this</pre>\n<!--[if IE]>ie<![endif]-->\n</body></html>'
+        self.assertEqual(
+            minify_html(html),
+            b'<html>\n<body>\n<p>a b</p>\n<pre>  keep\n   this</pre>\n<!--[if IE]>ie<![endif]-->\n</body></html>'
+        )
+
+    def test_html_keeps_attributes(self):
+        html = b'<p title="a   b"\n   class=\'x  > y\'>c   d</p>'
+        self.assertEqual(minify_html(html), b'<p title="a   b"\n   class=\'x  > y\'>c d</p>')
+
+    def test_css(self):
+        css = b'/* theme */\na:hover , b > i {\n  content: "  /* x */  ";\n  color : red;\n}\n'
+        self.assertEqual(minify_css(css), b'a:hover,b>i{content: "  /* x */  ";color : red}')
+
+    def test_css_keeps_strings(self):
+        self.assertEqual(minify_css(b'a { content: "x;}y"; }'), b'a{content: "x;}y"}')
+
+    def test_js(self):
+        self.assertEqual(minify_js(b'function f() {\n    return 1;\n\n}\n'), b'function f() {\nreturn 1;\n}')
+        template = b'let s = `a\n    b`;\n'
+        self.assertEqual(minify_js(template), template)
+
+
+class RecompressTestCase(TestCase):
+    def test_png_is_lossless(self):
+        data = make_png()
+        smaller = recompress_png(data)
+        self.assertLess(len(smaller), len(data))
+        chunks = png_chunks(smaller)
+        self.assertEqual([kind for kind, _ in chunks], [b'IHDR', b'tEXt', b'IDAT', b'IEND'])
+        original = zlib.decompress(b''.join(body for kind, body in png_chunks(data) if kind == b'IDAT'))
+        self.assertEqual(zlib.decompress(chunks[2][1]), original)
+
+
+class OptimizeFileTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmp.name, 'cache')
+        os.mkdir(self.cache)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_sidecars_and_cache(self):
+        css = b'body {\n    margin : 0;\n}\n' * 200
+        path = self.write('style.css', css)
+        _, before, after = optimize_file(path, self.cache, with_sidecars=True)
+        self.assertEqual(before, len(css))
+        self.assertLess(after, before)
+        with open(path, 'rb') as f:
+            minified = f.read()
+        with open(path + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), minified)
+
+        other = self.write('copy.css', css)
+        with mock.patch.object(optimize, 'transform') as transform:
+            optimize_file(other, self.cache, with_sidecars=True)
+        transform.assert_not_called()
+        with open(other, 'rb') as f:
+            self.assertEqual(f.read(), minified)
+        self.assertTrue(os.path.exists(other + '.gz'))
+
+    def test_never_grows(self):
+        path = self.write('tiny.js', b'x')
+        self.assertEqual(optimize_file(path, with_sidecars=True)[1:], (1, 1))
+        self.assertFalse(os.path.exists(path + '.gz'))
+
+    def test_other_files_are_not_read(self):
+        path = self.write('intro.mp4', b'video' * 1000)
+        with mock.patch('builtins.open', side_effect=AssertionError('read')):
+            self.assertEqual(optimize_file(path, self.cache, with_sidecars=True)[1:], (5000, 5000))
+        self.assertEqual(os.listdir(self.cache), [])
+        optimizer = Optimizer(cache_dir=self.cache)
+        optimizer.submit(path)
+        self.assertEqual(optimizer.futures, [])
+
+    def test_cache_hit_adds_missing_sidecars(self):
+        css = b'body {\n    margin : 0;\n}\n' * 200
+        optimize_file(self.write('style.css', css), self.cache)
+        other = self.write('copy.css', css)
+        optimize_file(other, self.cache, with_sidecars=True)
+        with open(other + '.gz', 'rb') as f, open(other, 'rb') as minified:
+            self.assertEqual(gzip.decompress(f.read()), minified.read())
+        self.assertTrue(any(name.endswith('.css.gz') for name in os.listdir(self.cache)))
+
+    def test_one_pool_across_threads(self):
+        def slow_pool(**kwargs):
+            time.sleep(0.05)
+            return mock.Mock()
+        optimizer = Optimizer(jobs=1)
+        with mock.patch.object(optimize, 'ProcessPoolExecutor', side_effect=slow_pool) as pool:
+            threads = [threading.Thread(target=lambda: optimizer.pool) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        pool.assert_called_once()
+
+    def test_optimizer_pool(self):
+        os.mkdir(os.path.join(self.tmp.name, 'site'))
+        paths = [self.write(f'site/{index}.html', b'<p>\n   page   </p>\n') for index in range(3)]
+        optimizer = Optimizer(jobs=2, cache_dir=self.cache)
+        optimizer.optimize_tree(os.path.join(self.tmp.name, 'site'))
+        before, after = optimizer.close()
+        self.assertLess(after, before)
+        for path in paths:
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'<p>\npage </p>')
+
+
+class SiteHookTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @mock.patch('sys.stdout')
+    def test_saved_assets_are_submitted(self, mocked_io):
+        base = 'https://example.com'
+        site = Site(base, optimizer=mock.Mock())
+        asset = Link(base + '/css/site.css', page_url=base, base_url=base)
+        site.save_asset(asset, b'body {}')
+        site.optimizer.submit.assert_called_once_with(site.index.path_for(asset))
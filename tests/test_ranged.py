@@ -0,0 +1,97 @@
+import os
+import io
+import tempfile
+from unittest import TestCase
+
+from requests import Response
+
+from ranged import download_ranged, split, RangedDownload
+from exceptions import FileAlreadyExists
+
+DATA = bytes(range(256)) * 400       # 102400 bytes
+URL = 'https://example.com/media/video.mp4'
+
+
+class RangeSession:
+    '''serves ``DATA`` with range support, optionally dropping connections'''
+
+    def __init__(self, ranges=True, drop_after=None):
+        self.ranges = ranges
+        self.drop_after = drop_after
+        self.requests = []
+
+    def head(self, url, **kwargs):
+        res = Response()
+        res.status_code = 200
+        res.headers['Content-Length'] = str(len(DATA))
+        if self.ranges:
+            res.headers['Accept-Ranges'] = 'bytes'
+        return res
+
+    def get(self, url, headers=None, **kwargs):
+        start, end = headers['Range'].split('=')[1].split('-')
+        start, end = int(start), int(end)
+        self.requests.append((start, end))
+        body = DATA[start:end + 1]
+        if self.drop_after is not None and len(self.requests) == 1:
+            body = body[:self.drop_after]       # connection dropped mid chunk
+        res = Response()
+        res.status_code = 206
+        res.raw = io.BytesIO(body)
+        return res
+
+
+class RangedTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'media', 'video.mp4')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_split(self):
+        self.assertEqual(split(10, 4), [(0, 3), (4, 7), (8, 9)])
+        self.assertEqual(split(8, 4), [(0, 3), (4, 7)])
+
+    def test_parallel_download(self):
+        session = RangeSession()
+        self.assertTrue(download_ranged(URL, self.path, session, min_size=0, chunk_size=10000))
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(len(session.requests), 11)
+        self.assertFalse(os.path.exists(self.path + '.part'))
+        self.assertFalse(os.path.exists(self.path + '.part.json'))
+
+    def test_small_files_and_no_range_support_fall_back(self):
+        self.assertFalse(download_ranged(URL, self.path, RangeSession(), min_size=len(DATA) + 1))
+        self.assertFalse(download_ranged(URL, self.path, RangeSession(ranges=False), min_size=0))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_dropped_connection_resumes_inside_chunk(self):
+        session = RangeSession(drop_after=1000)
+        download_ranged(URL, self.path, session, min_size=0, chunk_size=len(DATA), workers=1)
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, [(0, len(DATA) - 1), (1000, len(DATA) - 1)])
+
+    def test_resumes_partial_file(self):
+        download = RangedDownload(URL, self.path, len(DATA), RangeSession(), chunk_size=50000)
+        os.makedirs(os.path.dirname(self.path))
+        with open(download.part, 'wb') as f:
+            f.write(DATA[:50000])
+            f.truncate(len(DATA))
+        download.done = {0}
+        download.save_state()
+
+        session = RangeSession()
+        RangedDownload(URL, self.path, len(DATA), session, chunk_size=50000).run()
+        self.assertEqual(self.read(), DATA)
+        self.assertEqual(session.requests, [(50000, 99999), (100000, 102399)])
+
+    def test_existing_file_is_not_overwritten(self):
+        os.makedirs(os.path.dirname(self.path))
+        open(self.path, 'wb').close()
+        with self.assertRaises(FileAlreadyExists):
+            download_ranged(URL, self.path, RangeSession(), min_size=0)
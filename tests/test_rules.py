@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from rules import LinkRules, PrefixTrie
+from models import Link
+from generator import Parser
+
+
+class PrefixTrieTestCase(TestCase):
+    def test_match(self):
+        trie = PrefixTrie(['/calendar', '/search', '/cal'])
+        self.assertTrue(trie.match('/calendar/2022/10'))
+        self.assertTrue(trie.match('/cal'))
+        self.assertTrue(trie.match('/search?q=1'))
+        self.assertFalse(trie.match('/ca'))
+        self.assertFalse(trie.match('/about'))
+
+    def test_empty_trie(self):
+        self.assertFalse(PrefixTrie())
+        self.assertFalse(PrefixTrie().match('/about'))
+
+
+class LinkRulesTestCase(TestCase):
+    def setUp(self) -> None:
+        self.base_url = 'https://example.com'
+        self.rules = LinkRules(
+            exclude=[r'[?&]sort=', r'\.pdf$'],
+            exclude_paths=['calendar'],
+            max_depth=2
+        )
+
+    def test_exclude(self):
+        self.assertFalse(self.rules.allows('?page=1&sort=asc', self.base_url))
+        self.assertFalse(self.rules.allows('files/report.pdf', self.base_url))
+        self.assertTrue(self.rules.allows('/about', self.base_url))
+
+    def test_exclude_paths(self):
+        self.assertFalse(self.rules.allows('/calendar/2022', self.base_url))
+        self.assertFalse(self.rules.allows('https://example.com/calendar', self.base_url))
+        self.assertTrue(self.rules.allows('https://example.com/about', self.base_url))
+
+    def test_include(self):
+        rules = LinkRules(include=[r'/blog/', r'/docs/'])
+        self.assertTrue(rules.allows('/blog/post-1', self.base_url))
+        self.assertTrue(rules.allows('https://example.com/docs/', self.base_url))
+        self.assertFalse(rules.allows('/shop', self.base_url))
+
+    def test_depth(self):
+        self.assertTrue(self.rules.allows_depth(2))
+        self.assertFalse(self.rules.allows_depth(3))
+        self.assertTrue(LinkRules().allows_depth(100))
+
+    def test_url_to_links_applies_rules(self):
+        urls = ['/about', '/calendar/2022', '?sort=name', 'mailto:me@example.com']
+        links = Link.url_to_links(urls, page_url=self.base_url, base_url=self.base_url, rules=self.rules, depth=1)
+        self.assertEqual([str(link) for link in links], ['https://example.com/about'])
+        self.assertEqual(links[0].depth, 1)
+        self.assertEqual(Link.url_to_links(urls, self.base_url, self.base_url, rules=self.rules, depth=3), [])
+
+    def test_rules_see_the_resolved_url(self):
+        page_url = 'https://example.com/calendar/'
+        urls = ['month?m=3', '?month=4', '../about', '/calendar/2023']
+        links = Link.url_to_links(urls, page_url=page_url, base_url=self.base_url, rules=self.rules)
+        self.assertEqual([str(link) for link in links], ['https://example.com/about'])
+        rules = LinkRules(include=[r'/blog/'])
+        self.assertTrue(rules.allows('post-2', self.base_url, 'https://example.com/blog/'))
+        self.assertFalse(rules.allows('post-2', self.base_url, 'https://example.com/shop/'))
+
+    def test_parser_links_are_one_level_deeper(self):
+        html = '<a href="/about">about</a><img src="/logo.png">'
+        parser = Parser(html=html, page_url=self.base_url, base_url=self.base_url, rules=self.rules, depth=2)
+        self.assertEqual(parser.get_links(), [])
+        self.assertEqual(len(parser.get_images()), 1)
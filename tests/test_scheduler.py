@@ -0,0 +1,140 @@
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+import io
+import os
+import time
+import asyncio
+import tempfile
+
+from requests import Response
+
+from scheduler import AssetScheduler, SizeCache, TokenBucket, PrioritySemaphore, classify, CRITICAL, MEDIA
+from sites import Site, Page
+from models import Link
+
+BASE = 'https://example.com'
+
+
+class AssetSchedulerTestCase(TestCase):
+    def test_classify(self):
+        self.assertEqual(classify(BASE + '/style.css?v=2')[0], CRITICAL)
+        self.assertEqual(classify(BASE + '/app.js')[0], CRITICAL)
+        self.assertEqual(classify(BASE + '/intro.mp4')[0], MEDIA)
+
+    def test_order(self):
+        sizes = SizeCache()
+        sizes.record(BASE + '/big.png', 5 * 1024 ** 2)
+        sizes.record(BASE + '/small.mp4', 1024)
+        scheduler = AssetScheduler(sizes)
+        for url, page in [
+                ('/intro.mp4', 0), ('/small.mp4', 1), ('/big.png', 0), ('/icon.png', 0),
+                ('/late.css', 1), ('/app.js', 0), ('/style.css', 0)]:
+            scheduler.push_asset(BASE + url, page)
+        scheduler.push_page('page 1', 1)
+        scheduler.push_page('page 0', 0)
+        self.assertEqual(
+            [item.replace(BASE, '') for item in scheduler],
+            ['page 0', '/style.css', '/app.js', 'page 1', '/late.css', '/icon.png', '/big.png', '/small.mp4', '/intro.mp4']
+        )
+
+
+class SizeCacheTestCase(TestCase):
+    def test_probe_and_save(self):
+        def head(url, **kwargs):
+            res = Response()
+            res.status_code = 200
+            res.headers['Content-Length'] = '2048'
+            return res
+        session = mock.Mock()
+        session.head.side_effect = head
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sizes.json')
+            sizes = SizeCache(path)
+            sizes.record(BASE + '/known.png', 10)
+            sizes.probe([BASE + '/known.png', BASE + '/new.png'], session)
+            session.head.assert_called_once()
+            sizes.save()
+            self.assertEqual(SizeCache(path).sizes, {BASE + '/known.png': 10, BASE + '/new.png': 2048})
+
+
+class TokenBucketTestCase(TestCase):
+    def test_rate(self):
+        bucket = TokenBucket(100 * 1024, burst=10 * 1024)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.consume(10 * 1024)
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+
+class PrioritySemaphoreTestCase(IsolatedAsyncioTestCase):
+    async def test_lowest_priority_first(self):
+        semaphore = PrioritySemaphore(1)
+        order = []
+
+        async def task(priority):
+            async with semaphore.slot((priority,)):
+                order.append(priority)
+                await asyncio.sleep(0)
+
+        await semaphore.acquire()
+        tasks = [asyncio.ensure_future(task(priority)) for priority in (3, 1, 2)]
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, [1, 2, 3])
+
+
+class SiteDownloadOrderTestCase(TestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_pages_are_written_with_their_cssjs(self, mocked_io):
+        site = Site(BASE)
+        pages = [
+            Page(Link(BASE + '/one', page_url=BASE, base_url=BASE), None, base_url=BASE, content=b'<img src="/a.png"><link rel="stylesheet" href="/one.css">'),
+            Page(Link(BASE + '/two', page_url=BASE, base_url=BASE), None, base_url=BASE, content=b'<script src="/two.js"></script>'),
+        ]
+        for page in pages:
+            site.add_page(page.link, page)
+        written = []
+        site.session.get = mock.Mock(side_effect=lambda url, **kwargs: written.append(url) or mock.Mock(
+            status_code=200, raw=None, content=b'x', headers={}))
+        with mock.patch.object(Page, 'download', autospec=True, side_effect=lambda page: written.append(page.url)):
+            site.download(assets=list(site.assets), pages=pages)
+        self.assertEqual([url.replace(BASE, '') for url in written], ['/one', '/one.css', '/two', '/two.js', '/a.png'])
+
+
+class ProbeTestCase(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    async def test_assets_of_a_page_are_probed_at_once(self, mocked_io):
+        def get(url, **kwargs):
+            res = Response()
+            res.status_code = 200
+            res._content = b'<img src="/a.png"><img src="/b.png"><script src="/c.js"></script>' if url == BASE else b'x'
+            return res
+
+        session = mock.Mock()
+        session.get.side_effect = get
+        session.head.return_value = mock.Mock(status_code=200, headers={'Content-Length': '10'})
+        site = Site(BASE, single_page=True, probe_sizes=True)
+        with mock.patch.object(SizeCache, 'probe', autospec=True, side_effect=SizeCache.probe) as probe:
+            results = [result async for result in site.iter_clone(session)]
+        probe.assert_called_once()
+        self.assertEqual(sorted(str(url) for url in probe.call_args.args[1]), [BASE + '/a.png', BASE + '/b.png', BASE + '/c.js'])
+        self.assertEqual(session.head.call_count, 3)
+        self.assertEqual(len(results), 4)
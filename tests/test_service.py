@@ -0,0 +1,108 @@
+from unittest import TestCase, mock
+import os
+import json
+import tempfile
+import threading
+import http.client
+
+from service import CloneService, make_server, DONE, FAILED
+from exceptions import InvalidInputError
+
+
+def fake_clone(url, base_dir, **params):
+    filename = os.path.join(base_dir, 'example.com.zip')
+    with open(filename, 'wb') as f:
+        f.write(b'zip')
+    return filename
+
+
+class CloneServiceTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = CloneService(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_submit_validates(self):
+        with self.assertRaises(InvalidInputError):
+            self.service.submit('not a url')
+        with self.assertRaises(InvalidInputError):
+            self.service.submit('https://example.com', {'unknown': 1})
+        with self.assertRaises(InvalidInputError):
+            self.service.submit('https://example.com', {'manifest': '/etc/manifest.json'})
+        with self.assertRaises(InvalidInputError):
+            self.service.submit('https://example.com', {'user': 'me'})
+
+    def test_priority_order(self):
+        low = self.service.submit('https://example.com/low', priority=5)
+        first = self.service.submit('https://example.com/first')
+        second = self.service.submit('https://example.com/second')
+        order = [self.service.queue.get()[2] for _ in range(3)]
+        self.assertEqual(order, [first, second, low])
+
+    @mock.patch('service.clone', side_effect=fake_clone)
+    def test_run_shares_the_connection_pool(self, mocked_clone):
+        job = self.service.submit('https://example.com', {'include_media': True})
+        self.service.run(job)
+        self.assertEqual(job.status, DONE)
+        first = mocked_clone.call_args.kwargs['session']
+        self.assertIs(first.get_adapter('https://example.com'), self.service.adapter)
+        self.assertTrue(mocked_clone.call_args.kwargs['include_media'])
+        first.cookies.set('token', 'client-one', domain='example.com')
+
+        job = self.service.submit('https://example.com', {'user': 'me', 'password': 'secret'})
+        self.service.run(job)
+        second = mocked_clone.call_args.kwargs['session']
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second.cookies), 0)
+        self.assertIs(second.get_adapter('http://example.com'), self.service.adapter)
+
+    @mock.patch('service.clone', side_effect=RuntimeError('boom'))
+    def test_failed_job(self, mocked_clone):
+        job = self.service.submit('https://example.com')
+        self.service.run(job)
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.error, 'boom')
+
+
+class ServiceAPITestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = CloneService(self.tmp.name)
+        self.server = make_server(self.service, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.stop()
+        self.tmp.cleanup()
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection(*self.server.server_address)
+        connection.request(method, path, body=json.dumps(body) if body is not None else None)
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+        return response.status, data
+
+    @mock.patch('service.clone', side_effect=fake_clone)
+    def test_submit_and_download(self, mocked_clone):
+        status, data = self.request('POST', '/jobs', {'url': 'https://example.com', 'options': {'max_depth': 1}})
+        self.assertEqual(status, 201)
+        job_id = json.loads(data)['id']
+
+        status, data = self.request('GET', f'/jobs/{job_id}/artifact')
+        self.assertEqual(status, 409)
+
+        self.service.run(self.service.queue.get()[2])
+        status, data = self.request('GET', f'/jobs/{job_id}')
+        self.assertEqual(json.loads(data)['status'], DONE)
+        status, data = self.request('GET', f'/jobs/{job_id}/artifact')
+        self.assertEqual((status, data), (200, b'zip'))
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request('POST', '/jobs', {'url': 'nope'})[0], 400)
+        self.assertEqual(self.request('GET', '/jobs/missing')[0], 404)
+        self.assertEqual(self.request('GET', '/jobs'), (200, b'[]'))
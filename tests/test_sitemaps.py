@@ -0,0 +1,111 @@
+import io
+import gzip
+from unittest import TestCase, mock
+
+from requests import Response
+
+from sitemaps import iter_sitemap_urls, robots_sitemaps, parse_sitemap
+from sites import Site
+
+ROBOTS = b'''User-agent: *
+Disallow: /admin
+Sitemap: https://example.com/sitemap_index.xml
+'''
+
+INDEX = b'''<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <sitemap><loc>https://example.com/pages.xml.gz</loc></sitemap>
+    <sitemap><loc>https://example.com/posts.xml</loc></sitemap>
+</sitemapindex>
+'''
+
+PAGES = b'''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <url><loc>https://example.com/about</loc></url>
+    <url><loc>https://example.com/contact</loc></url>
+</urlset>
+'''
+
+POSTS = b'''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+    <url><loc> https://example.com/posts/1 </loc></url>
+    <url><loc>https://other.com/posts/2</loc></url>
+</urlset>
+'''
+
+IMAGES = b'''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+    <url>
+        <loc>https://example.com/gallery</loc>
+        <image:image><image:loc>https://example.com/pic.jpg</image:loc></image:image>
+    </url>
+</urlset>
+'''
+
+FILES = {
+    'https://example.com/robots.txt': ROBOTS,
+    'https://example.com/sitemap_index.xml': INDEX,
+    'https://example.com/pages.xml.gz': gzip.compress(PAGES),
+    'https://example.com/posts.xml': POSTS,
+}
+
+
+def mock_get(url, **kwargs):
+    res = Response()
+    if url in FILES:
+        res.status_code = 200
+        res.raw = io.BytesIO(FILES[url])
+    else:
+        res.status_code = 404
+        res.raw = io.BytesIO(b'')
+    return res
+
+
+class SitemapTestCase(TestCase):
+    def setUp(self) -> None:
+        self.session = mock.Mock()
+        self.session.get.side_effect = mock_get
+
+    def test_robots_sitemaps(self):
+        self.assertEqual(
+            robots_sitemaps('https://example.com', self.session),
+            ['https://example.com/sitemap_index.xml']
+        )
+
+    def test_parse_sitemap(self):
+        locs = list(parse_sitemap(io.BytesIO(INDEX)))
+        self.assertEqual(locs, [
+            ('https://example.com/pages.xml.gz', True),
+            ('https://example.com/posts.xml', True),
+        ])
+
+    def test_extension_locs_are_not_pages(self):
+        self.assertEqual(list(parse_sitemap(io.BytesIO(IMAGES))), [('https://example.com/gallery', False)])
+
+    def test_nested_and_gzipped_sitemaps_are_followed(self):
+        urls = list(iter_sitemap_urls('https://example.com', self.session))
+        self.assertEqual(urls, [
+            'https://example.com/about',
+            'https://example.com/contact',
+            'https://example.com/posts/1',
+            'https://other.com/posts/2',
+        ])
+
+    def test_falls_back_to_sitemap_xml(self):
+        FILES['https://example.org/sitemap.xml'] = PAGES
+        try:
+            urls = list(iter_sitemap_urls('https://example.org', self.session))
+        finally:
+            del FILES['https://example.org/sitemap.xml']
+        self.assertEqual(len(urls), 2)
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_site_seeds_internal_pages(self, mocked_io):
+        site = Site('https://example.com', use_sitemaps=True)
+        site.session = self.session
+        self.assertEqual(site.seed(), 3)
+        self.assertEqual(
+            [str(link) for link in site.site_links],
+            ['https://example.com/about', 'https://example.com/contact', 'https://example.com/posts/1']
+        )
@@ -1,10 +1,12 @@
-from unittest import TestCase, mock
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
 import requests
 from requests import Response
 import io
+import os
+import tempfile
 
 from sites import Site, Page
-from exceptions import PageNotFoundError, AuthenticationError
+from exceptions import PageNotFoundError, AuthenticationError, InvalidInputError
 from utils import make_byte
 
 PAGE_LINK = 'https://example.com/about'
@@ -125,3 +127,77 @@ class SiteTestCase(TestCase):
         self.assertEqual(len(site.cssjs), 6)
         self.assertEqual(len(site.assets), 9)
 
+
+class AsyncSiteTestCase(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @staticmethod
+    def session():
+        def get(url, **kwargs):
+            res = Response()
+            res.status_code = 200
+            res._content = make_byte(PAGE_CONTENT) if url == PAGE_LINK else b'asset'
+            return res
+        session = mock.Mock()
+        session.get.side_effect = get
+        return session
+
+    async def test_page_fetch(self):
+        page = await Page.fetch(PAGE_LINK, self.session(), base_url='https://example.com')
+        self.assertIsInstance(page, Page)
+        self.assertEqual(len(page.get_links()), 5)
+
+    async def test_page_fetch_with_async_client(self):
+        session = self.session()
+        client = mock.Mock()
+        client.get = mock.AsyncMock(side_effect=session.get)
+        page = await Page.fetch(PAGE_LINK, client, base_url='https://example.com')
+        self.assertEqual(page._content, make_byte(PAGE_CONTENT))
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    async def test_iter_clone_yields_pages_and_assets(self, mocked_io):
+        site = Site(PAGE_LINK, single_page=True)
+        results = [result async for result in site.iter_clone(self.session())]
+        pages = [r for r in results if isinstance(r, Page)]
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(results), 1 + len({str(asset) for asset in site.assets}))
+        self.assertIn(str(PAGE_LINK), site.pages)
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    async def test_iter_clone_images_only_writes_no_page(self, mocked_io):
+        site = Site(PAGE_LINK, single_page=True, images_only=True)
+        with mock.patch.object(Page, 'download') as download:
+            results = [result async for result in site.iter_clone(self.session())]
+        download.assert_not_called()
+        self.assertTrue(any(isinstance(r, Page) for r in results))
+
+    async def test_async_client_cannot_record_warc(self):
+        client = mock.Mock()
+        client.get = mock.AsyncMock()
+        with self.assertRaises(InvalidInputError):
+            await Page.aget(PAGE_LINK, client, warc=mock.Mock())
+
+
+class ImagePolicyTestCase(TestCase):
+    HTML = b'<img src="/img/a.jpg" srcset="/img/a-480.jpg 480w, /img/a-960.jpg 960w">'
+
+    def test_content_keeps_only_the_chosen_candidate(self):
+        page = Page(PAGE_LINK, None, base_url='https://example.com', content=self.HTML, image_policy='smallest')
+        with mock.patch('sys.stdout', new_callable=io.StringIO):
+            content = page.content
+        self.assertIn(b'src="img/a-480.jpg" srcset="img/a-480.jpg"', content)
+        self.assertNotIn(b'a-960.jpg', content)
+
+    def test_other_references_to_the_fallback_are_kept(self):
+        html = self.HTML + b'<a href="/img/a.jpg">full size</a>'
+        page = Page(PAGE_LINK, None, base_url='https://example.com', content=html, image_policy='smallest')
+        page.get_images()
+        self.assertEqual(page.parser.transforms[b'src="/img/a.jpg"'], b'src="/img/a-480.jpg"')
+        self.assertNotIn(b'/img/a.jpg', page.parser.transforms)
@@ -0,0 +1,43 @@
+from unittest import TestCase
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# time --help may take on top of a bare interpreter, loading requests and bs4 alone takes longer
+HELP_BUDGET = 0.15
+MAIN = os.path.join(ROOT, 'main.py')
+
+
+def run(*args):
+    '''runs python in an empty folder, so the log files land there'''
+    with tempfile.TemporaryDirectory() as cwd:
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, *args], cwd=cwd, capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': ROOT}
+        )
+        return time.perf_counter() - start, process
+
+
+class StartupTestCase(TestCase):
+    def test_import_is_light(self):
+        _, process = run('-c', 'import sys, main; print(sorted({"requests", "bs4", "url_parser", "sites"} & set(sys.modules)))')
+        self.assertEqual(process.stdout.strip(), '[]')
+
+    def test_help_is_fast(self):
+        bare = min(run('-c', 'pass')[0] for _ in range(3))
+        runs = [run(MAIN, '--help') for _ in range(3)]
+        self.assertEqual(runs[0][1].returncode, 0)
+        self.assertLess(min(elapsed for elapsed, _ in runs) - bare, HELP_BUDGET)
+
+    def test_invalid_url_exits_before_any_request(self):
+        _, process = run(MAIN, 'not a url')
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn('URL failed validation', process.stderr)
+
+    def test_frontier_rejects_unsupported_flags(self):
+        _, process = run(MAIN, 'https://example.com', '--frontier', 'frontier.db', '--warc', 'warc', '--near-duplicates')
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn('--warc, --near-duplicates cannot be used with --frontier', process.stderr)
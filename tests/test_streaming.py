@@ -0,0 +1,143 @@
+import io
+import os
+import tempfile
+import threading
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+
+from requests import Response
+
+from streaming import LinkExtractor, PAGE, CSSJS, IMAGE, MEDIA
+from sites import Site, Page
+
+HOMEPAGE = 'https://example.com'
+STYLE = 'https://example.com/style.css'
+
+
+class LinkExtractorTestCase(TestCase):
+    def extract(self, chunks):
+        found = []
+        extractor = LinkExtractor(lambda kind, urls: found.extend((kind, url) for url in urls))
+        for chunk in chunks:
+            extractor.feed_bytes(chunk)
+        extractor.close()
+        return found
+
+    def test_links_are_reported_by_kind(self):
+        html = (
+            '<link rel="stylesheet" href="style.css"><link rel="icon" href="favicon.ico">'
+            '<script src="main.js"></script><a href="/about">about</a>'
+            '<img src="logo.png"><img src="hero.jpg" srcset="hero-2x.jpg 2x">'
+            '<video src="intro.mp4" poster="poster.jpg"><track src="subs.vtt"></video>'
+        ).encode()
+        self.assertEqual(sorted(self.extract([html])), sorted([
+            (CSSJS, 'style.css'), (IMAGE, 'favicon.ico'), (CSSJS, 'main.js'), (PAGE, '/about'),
+            (IMAGE, 'logo.png'), (MEDIA, 'intro.mp4'), (MEDIA, 'poster.jpg'), (MEDIA, 'subs.vtt'),
+        ]))
+
+    def test_tags_split_across_chunks(self):
+        html = '<p>café</p><a href="/a">a</a><img src="/b.png">'.encode()
+        chunks = [html[i:i + 5] for i in range(0, len(html), 5)]
+        self.assertEqual(self.extract(chunks), [(PAGE, '/a'), (IMAGE, '/b.png')])
+
+    def test_urls_are_reported_per_chunk(self):
+        found = []
+        extractor = LinkExtractor(lambda kind, urls: found.append(urls))
+        extractor.feed_bytes(b'<a href="/a">a</a>')
+        self.assertEqual(found, [['/a']])
+        extractor.feed_bytes(b'<a href="/b">b</a>')
+        self.assertEqual(found, [['/a'], ['/b']])
+
+
+class SlowBody(io.RawIOBase):
+    '''a page body whose end only arrives once the stylesheet was requested'''
+
+    def __init__(self, requested: threading.Event):
+        self.requested = requested
+        self.chunks = [b'<html><head><link rel="stylesheet" href="style.css">', b'</head></html>']
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if not self.chunks:
+            return b''
+        if len(self.chunks) == 1:
+            self.requested.wait(timeout=5)
+        return self.chunks.pop(0)
+
+
+class StreamingSiteTestCase(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    async def test_assets_are_fetched_while_the_page_downloads(self, mocked_io):
+        requested = threading.Event()
+        early = []
+
+        def get(url, **kwargs):
+            res = Response()
+            res.status_code = 200
+            res.headers['Content-Type'] = 'text/html'
+            if url == STYLE:
+                early.append(not page_done.is_set())
+                requested.set()
+                res.raw = io.BytesIO(b'body {}')
+            else:
+                res.raw = SlowBody(requested)
+            return res
+
+        page_done = threading.Event()
+        session = mock.Mock()
+        session.get.side_effect = get
+
+        site = Site(HOMEPAGE, single_page=True, streaming=True)
+        async for result in site.iter_clone(session):
+            if str(result) == HOMEPAGE:
+                page_done.set()
+
+        self.assertEqual(early, [True])
+        self.assertEqual(site.visited_links, [STYLE])
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    async def test_duplicate_pages_links_are_held_back(self, mocked_io):
+        text = b'<p>' + b' '.join(b'word%d' % i for i in range(200)) + b'</p>'
+        pages = {
+            HOMEPAGE: text + b'<a href="/copy">next</a>',
+            HOMEPAGE + '/copy': text + b'<a href="/hidden">next</a>',
+        }
+
+        def get(url, **kwargs):
+            res = Response()
+            res.status_code = 200
+            res.headers['Content-Type'] = 'text/html'
+            res.raw = io.BytesIO(pages.get(url, b'<p>hidden</p>'))
+            return res
+
+        session = mock.Mock()
+        session.get.side_effect = get
+        site = Site(HOMEPAGE, streaming=True, near_duplicates=3)
+        async for _ in site.iter_clone(session):
+            pass
+        requested = [call.args[0] for call in session.get.call_args_list]
+        self.assertNotIn(HOMEPAGE + '/hidden', requested)
+        self.assertEqual(site.duplicates, {HOMEPAGE + '/copy': HOMEPAGE})
+
+
+class PageGetTestCase(TestCase):
+    def test_extractor_is_closed(self):
+        res = Response()
+        res.status_code = 200
+        res.headers['Content-Type'] = 'text/html'
+        res.raw = io.BytesIO(b'<a href="/a">a</a>')
+        session = mock.Mock()
+        session.get.return_value = res
+        with mock.patch.object(LinkExtractor, 'close', autospec=True, side_effect=LinkExtractor.close) as close:
+            Page.get(HOMEPAGE, session=session, on_discover=lambda kind, urls: None)
+        close.assert_called_once()
@@ -1,8 +1,8 @@
 import os
 from io import BytesIO
-from unittest import TestCase
+from unittest import TestCase, mock
 
-from utils import make_byte, make_relative, validate_url, save_file, is_file_path
+from utils import make_byte, make_relative, validate_url, save_file, is_file_path, ping, PING_TIMEOUT
 
 class UtilsTestCase(TestCase):
     def test_make_byte_works(self):
@@ -46,4 +46,10 @@ class UtilsTestCase(TestCase):
 
     def test_is_file_path(self):
         self.assertTrue(is_file_path('http://localhost/example.html'))
-        self.assertFalse(is_file_path('http://localhost/example'))
\ No newline at end of file
+        self.assertFalse(is_file_path('http://localhost/example'))
+
+    @mock.patch('requests.head')
+    def test_ping_has_a_timeout(self, head):
+        head.return_value.status_code = 200
+        self.assertTrue(ping('https://example.com'))
+        head.assert_called_once_with('https://example.com', timeout=PING_TIMEOUT)
@@ -0,0 +1,90 @@
+import gzip
+import tempfile
+from unittest import TestCase
+
+import requests
+from requests import Response
+
+from warc import WARCWriter
+
+
+def make_response(url, content=b'<html></html>', status=200):
+    res = Response()
+    res.status_code = status
+    res.reason = 'OK'
+    res.url = url
+    res._content = content
+    res.headers['Content-Type'] = 'text/html'
+    res.headers['Content-Encoding'] = 'gzip'
+    res.request = requests.Request('GET', url).prepare()
+    return res
+
+
+class WARCWriterTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_records_are_written(self):
+        with WARCWriter(self.directory) as warc:
+            warc.write_response(make_response('https://example.com/about'))
+        self.assertEqual(len(warc.files), 1)
+
+        with gzip.open(warc.files[0]) as f:
+            data = f.read()
+        self.assertEqual(data.count(b'WARC/1.1\r\n'), 3)
+        self.assertIn(b'WARC-Type: warcinfo', data)
+        self.assertIn(b'WARC-Type: response', data)
+        self.assertIn(b'WARC-Type: request', data)
+        self.assertIn(b'WARC-Target-URI: https://example.com/about', data)
+        self.assertIn(b'HTTP/1.1 200 OK\r\n', data)
+        self.assertIn(b'GET /about HTTP/1.1\r\n', data)
+        self.assertIn(b'<html></html>', data)
+
+    def test_transfer_headers_match_stored_body(self):
+        with WARCWriter(self.directory) as warc:
+            warc.write_response(make_response('https://example.com/', content=b'12345'))
+        with gzip.open(warc.files[0]) as f:
+            data = f.read()
+        self.assertNotIn(b'Content-Encoding', data)
+        self.assertIn(b'Content-Length: 5\r\n', data)
+
+    def test_each_record_is_a_gzip_member(self):
+        with WARCWriter(self.directory) as warc:
+            warc.write_response(make_response('https://example.com/'))
+        with open(warc.files[0], 'rb') as f:
+            raw = f.read()
+        # warcinfo, response and request
+        self.assertEqual(raw.count(b'\x1f\x8b\x08'), 3)
+
+    def test_rotates_by_size(self):
+        with WARCWriter(self.directory, max_size=1) as warc:
+            warc.write_response(make_response('https://example.com/1'))
+            warc.write_response(make_response('https://example.com/2'))
+        self.assertEqual(len(warc.files), 2)
+        self.assertNotEqual(warc.files[0], warc.files[1])
+
+    def test_uncompressed_output(self):
+        with WARCWriter(self.directory, compress=False) as warc:
+            warc.write_response(make_response('https://example.com/'))
+        self.assertTrue(warc.files[0].endswith('.warc'))
+        with open(warc.files[0], 'rb') as f:
+            self.assertTrue(f.read().startswith(b'WARC/1.1'))
+
+    def test_redirects_are_recorded(self):
+        redirect = make_response('https://example.com/old', content=b'', status=301)
+        redirect.reason = 'Moved Permanently'
+        redirect.headers['Location'] = '/new'
+        response = make_response('https://example.com/new')
+        response.history = [redirect]
+        with WARCWriter(self.directory) as warc:
+            warc.write_response(response)
+        with gzip.open(warc.files[0]) as f:
+            data = f.read()
+        self.assertEqual(data.count(b'WARC-Type: response'), 2)
+        self.assertLess(data.index(b'HTTP/1.1 301 Moved Permanently'), data.index(b'HTTP/1.1 200 OK'))
+        self.assertIn(b'GET /old HTTP/1.1\r\n', data)
+        self.assertIn(b'Location: /new\r\n', data)
@@ -2,12 +2,10 @@
 
 import os
 import re
-import requests
 import logging
 from io import BytesIO
 from pathlib import Path
 from urllib.parse import urlparse, urlunparse
-import zipfile
 
 
 from exceptions import FileAlreadyExists
@@ -70,9 +68,14 @@ def make_relative(page: bytes, transforms: dict) -> bytes:
     return page
 
 
-def ping(url: str) -> bool:
-    '''checks if the url is online and active'''
-    r = requests.head(url)
+PING_TIMEOUT = 10
+
+
+def ping(url: str, timeout: float = PING_TIMEOUT) -> bool:
+    '''checks if the url is online and active, waiting at most ``timeout`` seconds'''
+    import requests
+
+    r = requests.head(url, timeout=timeout)
     return r.status_code == 200
 
 
@@ -113,12 +116,7 @@ def save_file(path: str, content: BytesIO, overwrite: bool = False):
     
 
 def export(*, dir_name, filename, **kwargs):
-    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as tar:
-        for root, dirs, files in os.walk(dir_name):
-            for file in files:
-                tar.write(
-                    os.path.join(root, file),
-                    os.path.relpath(os.path.join(root, file)),
-                    os.path.join(dir_name, '..')
-                )
-    return filename
\ No newline at end of file
+    '''zips ``dir_name`` in parallel, see ``archive.make_zip``'''
+    from archive import make_zip
+
+    return make_zip(filename, dir_name, **kwargs)
\ No newline at end of file
@@ -0,0 +1,172 @@
+'''Writes the raw http exchanges of a crawl to WARC files'''
+
+import os
+import gzip
+import uuid
+import base64
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Tuple
+
+WARC_VERSION = b'WARC/1.1'
+CRLF = b'\r\n'
+
+# headers describing a transfer which no longer applies to the stored body
+# (``requests`` hands us the decoded payload)
+TRANSFER_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+
+def warc_date() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def record_id() -> str:
+    return f'<urn:uuid:{uuid.uuid4()}>'
+
+
+def payload_digest(payload: bytes) -> str:
+    return 'sha1:' + base64.b32encode(hashlib.sha1(payload).digest()).decode('ascii')
+
+
+def format_headers(lines: Iterable[Tuple[str, str]]) -> bytes:
+    return b''.join(f'{key}: {value}'.encode('latin-1', 'replace') + CRLF for key, value in lines)
+
+
+class WARCWriter:
+    '''Streams request/response records into gzipped WARC files
+
+    ...
+
+    Every record is written as a separate gzip member so readers can seek
+    straight to it, and a new file is started once the current one grows
+    past ``max_size`` bytes.
+
+    Attributes
+    ----------
+    directory (str)
+        the folder the warc files are written to
+    prefix (str)
+        the filename prefix of each warc file
+    max_size (int)
+        size in bytes after which the writer rotates to a new file
+    files (list)
+        the paths of all the files written so far
+    '''
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+            self,
+            directory: str,
+            *,
+            prefix: str = 'pyclone',
+            max_size: int = 1024 ** 3,
+            compress: bool = True
+        ) -> None:
+        self.directory = directory
+        self.prefix = prefix
+        self.max_size = max_size
+        self.compress = compress
+        self.files: List[str] = []
+        self._file = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def extension(self) -> str:
+        return '.warc.gz' if self.compress else '.warc'
+
+    def _open(self):
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        name = f'{self.prefix}-{stamp}-{len(self.files):05d}{self.extension}'
+        path = os.path.join(self.directory, name)
+        self._file = open(path, 'wb')
+        self.files.append(path)
+        info = format_headers([('software', 'pyclone'), ('format', 'WARC File Format 1.1')])
+        self._write_record('warcinfo', [('WARC-Filename', name)], 'application/warc-fields', [info])
+
+    def _write_record(self, warc_type: str, headers, content_type: str, blocks: List[bytes], rid: str = None):
+        '''writes a single record made of ``blocks`` without joining them'''
+        length = sum(len(block) for block in blocks)
+        head = format_headers([
+            ('WARC-Type', warc_type),
+            ('WARC-Record-ID', rid or record_id()),
+            ('WARC-Date', warc_date()),
+            *headers,
+            ('Content-Type', content_type),
+            ('Content-Length', length),
+        ])
+        out = gzip.GzipFile(fileobj=self._file, mode='wb') if self.compress else self._file
+        out.write(WARC_VERSION + CRLF + head + CRLF)
+        for block in blocks:
+            view = memoryview(block)
+            for start in range(0, len(view), self.CHUNK_SIZE):
+                out.write(view[start:start + self.CHUNK_SIZE])
+        out.write(CRLF + CRLF)
+        if self.compress:
+            out.close()     # ends the gzip member, leaves the file open
+
+    def write_response(self, response) -> None:
+        '''writes the request and response records of a ``requests`` response
+
+        the redirects it followed, from ``response.history``, are written
+        first so each hop can be replayed
+        '''
+        with self._lock:
+            if self._file is None:
+                self._open()
+            for hop in (*response.history, response):
+                self._write_exchange(hop)
+            if self._file.tell() >= self.max_size:
+                self._file.close()
+                self._file = None
+
+    def _write_exchange(self, response):
+        request = response.request
+        url = response.url or getattr(request, 'url', '')
+        body = response.content or b''
+        version = {10: 'HTTP/1.0', 11: 'HTTP/1.1'}.get(getattr(response.raw, 'version', 11), 'HTTP/1.1')
+
+        raw_headers = getattr(response.raw, 'headers', None) or response.headers
+        headers = [(k, v) for k, v in raw_headers.items() if k.lower() not in TRANSFER_HEADERS]
+        headers.append(('Content-Length', len(body)))
+        status = f'{version} {response.status_code} {response.reason or ""}'.encode('latin-1') + CRLF
+        http_head = status + format_headers(headers) + CRLF
+
+        if request is not None:
+            request_body = request.body or b''
+            if isinstance(request_body, str):
+                request_body = request_body.encode('utf8')
+            request_head = (
+                f'{request.method} {request.path_url} {version}'.encode('latin-1') + CRLF
+                + format_headers(request.headers.items()) + CRLF
+            )
+
+        response_id = record_id()
+        self._write_record(
+            'response',
+            [('WARC-Target-URI', url), ('WARC-Payload-Digest', payload_digest(body))],
+            'application/http; msgtype=response',
+            [http_head, body],
+            rid=response_id
+        )
+        if request is not None:
+            self._write_record(
+                'request',
+                [('WARC-Target-URI', url), ('WARC-Concurrent-To', response_id)],
+                'application/http; msgtype=request',
+                [request_head, request_body]
+            )
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None